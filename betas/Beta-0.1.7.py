@@ -1,13 +1,16 @@
-import os, discord, asyncio, modules.message_handler, modules.configs, modules.leveling, aiosqlite, datetime, discord.errors, re, random as rand, sys
+import os, discord, asyncio, modules.message_handler, modules.configs, modules.leveling, modules.command_sync, modules.storage, modules.level_cache, modules.ranks, modules.logs, datetime, discord.errors, re, random as rand, sys
 from discord import app_commands
 from dotenv import load_dotenv
 from pathlib import Path
 from discord.utils import get
 
 load_dotenv()
+modules.logs.setup()
 
 OWNER_ID = os.getenv('OWNER_ID')
 TOKEN = os.getenv('DISCORD_TOKEN')
+DEV_GUILD_ID = os.getenv('DEV_GUILD_ID')
+FORCE_SYNC = os.getenv('FORCE_SYNC', '').lower() in ('1', 'true', 'yes')
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
@@ -19,9 +22,11 @@ class AstromechClient(discord.Client):
         self.wiped_messages = set()
         self.xp_cooldowns = {}
         self.db_path = "./configs/levels.db"
+        self.storage = modules.level_cache.CachedStorage(modules.storage.SQLiteStorage(self.db_path))
+        self.rank_roles = modules.ranks.RankRoles()
 
     async def setup_hook(self):
-        await self.tree.sync()
+        await modules.command_sync.sync_if_changed(self.tree, dev_guild_id=DEV_GUILD_ID, force=FORCE_SYNC)
 
 client = AstromechClient()
 
@@ -39,13 +44,8 @@ async def send_as_webhook(channel, name, content, avatar_url=None):
         print(f"Webhook Error: {e}")
         return False
 
-def is_staff_or_whitelisted(member: discord.Member, configs: dict) -> bool:
-    staff_roles = configs["RoleWhitelist"]["guild_staff_roles"]
-    whitelisted_users = configs["UserWhitelist"]["whitelisted_users"]
-    return (
-        any(role.name.lower() in staff_roles for role in member.roles) or
-        member.name.lower() in whitelisted_users
-    )
+def is_staff_or_whitelisted(member: discord.Member, configs: modules.configs.CompiledConfig) -> bool:
+    return configs.is_staff(member)
 
 # --- Event Handlers ---
 @client.event
@@ -75,14 +75,12 @@ async def on_ready():
 
         if "configs" in [channel.name for channel in guild.channels]:
             print(f"Loading configs from channel is currently disabled. Loading default configurations instead. {guild.name}")
-            client.configs = modules.configs.load_configs()
+            client.configs = modules.configs.compile_configs(modules.configs.load_configs())
         else:
-            client.configs = modules.configs.load_configs()
+            client.configs = modules.configs.compile_configs(modules.configs.load_configs())
             print(f"No configs channel found in {guild.name}. Loaded default configurations.")
 
-    async with aiosqlite.connect("levels.db") as db:
-        await db.execute("CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY, xp INTEGER, level INTEGER)")
-        await db.commit()
+    await client.storage.open()
 
 @client.event
 async def on_member_join(member):
@@ -117,20 +115,12 @@ async def on_message_delete(message):
     permissions = message.channel.permissions_for(message.guild.me)
     configs = client.configs
 
-    staff_roles = configs["RoleWhitelist"]["guild_staff_roles"]
-    trusted_roles = configs["RoleWhitelist"]["guild_trusted_roles"]
-    whitelisted_users = configs["UserWhitelist"]["whitelisted_users"]
-
-    whitelisted_roles = {r.lower() for r in (staff_roles + trusted_roles)}
-
     if message.id in client.wiped_messages:
         client.wiped_messages.remove(message.id)
         return
 
     if permissions.manage_webhooks:
-        if (message.author == client.user or
-                message.author.name.lower() in {u.lower() for u in whitelisted_users} or
-                any(role.name.lower() in whitelisted_roles for role in message.author.roles)):
+        if message.author == client.user or configs.is_whitelisted(message.author):
             return
 
         logs_channel = discord.utils.get(message.guild.text_channels, name='logs')
@@ -196,7 +186,7 @@ async def boom(interaction: discord.Interaction, amount: int = 5, added_message:
 
 @client.tree.command(name="config_reload", description="Reload bot configurations.")
 async def config_reload(interaction: discord.Interaction):
-    client.configs = modules.configs.load_configs()
+    client.configs = modules.configs.compile_configs(modules.configs.load_configs())
     await interaction.response.send_message("Configurations reloaded successfully.", ephemeral=True)
 
 
@@ -259,11 +249,10 @@ async def mute(interaction: discord.Interaction, member: discord.Member):
 
 @client.tree.command(name="checkrank", description="Check your current rank.")
 async def checkrank(interaction: discord.Interaction):
-    ranks = ["Ensign", "Lieutenant", "Lieutenant Commander", "Commander", "Captain", "Vice Admiral", "Admiral", "Fleet Admiral"]
-    level = await modules.leveling.get_user_level(interaction.user.id, client.db_path, client.configs)
-    rank_name = ranks[level - 1]
+    xp, level = await modules.leveling.get_user_level(interaction.guild.id, interaction.user.id, client.storage, client.configs)
+    rank_name = modules.ranks.rank_for_level(level)
 
-    role = discord.utils.get(interaction.guild.roles, name=rank_name)
+    role = client.rank_roles.role_for_level(interaction.guild, level)
     if role:
         await interaction.response.send_message(f"Your current rank is: {role.mention}")
     else:
@@ -1,7 +1,14 @@
-import os, discord, asyncio, modules.message_handler, modules.configs, modules.leveling, aiosqlite, datetime, discord.errors, re, random as rand, sys
+import time
+STARTED = time.perf_counter()
+
+import multiprocessing
+if __name__ == "__main__":
+    # Scan worker processes of the frozen .exe start this same executable; this hands them off before any bot setup runs
+    multiprocessing.freeze_support()
+
+import os, discord, asyncio, modules.message_handler, modules.configs, modules.leveling, modules.ratelimit, modules.scanner, modules.flood, modules.domains, modules.storage, modules.level_cache, modules.scheduler, modules.maintenance, modules.ranks, modules.joins, modules.logs, modules.audit, modules.tracing, modules.startup, modules.reloader, modules.backup, datetime, logging, discord.errors, re, random as rand, sys
 from dotenv import load_dotenv
 from pathlib import Path
-from discord.utils import get
 
 #if getattr(sys, 'frozen', False):
 #    base_path = sys._MEIPASS
@@ -10,15 +17,49 @@ from discord.utils import get
 
 load_dotenv()#(os.path.join(base_path, ".env"))
 
+# Only needed by a handful of commands, so they load on first use instead of on every start
+xp_transfer = modules.startup.lazy_import("modules.xp_transfer")
+moderation = modules.startup.lazy_import("modules.moderation")
+
+# Everything goes through one queue; a background thread writes ./logs/astromech.log and the console
+modules.logs.setup(level=os.getenv('LOG_LEVEL', 'INFO').upper())
+log = logging.getLogger("astromech")
+startup = modules.startup.StartupProfiler(STARTED)
+startup.mark("imports")
+
 OWNER_ID = os.getenv('OWNER_ID')
 TOKEN = os.getenv('DISCORD_TOKEN')
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
-client = discord.Client(intents=intents)
-client.wiped_messages = set()
+# Member lists are fetched in the background after on_ready instead of holding it back
+client = discord.Client(intents=intents, chunk_guilds_at_startup=False)
+# message id -> time.monotonic() when the bot deleted it, so the delete event doesn't repost it
+client.wiped_messages = {}
 client.xp_cooldowns = {}
 client.db_path = "./configs/levels.db"
+client.storage = modules.level_cache.CachedStorage(modules.storage.SQLiteStorage(client.db_path))
+client.rate_limiter = modules.ratelimit.RateLimiter()
+client.scanner = modules.scanner.ScanService()
+client.flood_detector = modules.flood.FloodDetector()
+client.domain_blocklist = modules.domains.DomainBlocklist()
+client.guild_configs = {}
+client.rank_roles = modules.ranks.RankRoles()
+client.audit = modules.audit.AuditLog()
+# Only traces slower than TRACE_SLOW_MS (or that raised) are kept; TRACE_EXPORT picks where they go besides memory
+trace_exporters = {
+    "jsonl": lambda: modules.tracing.JsonlExporter(),
+    "otlp": lambda: modules.tracing.OtlpExporter(os.getenv('TRACE_OTLP_ENDPOINT', modules.tracing.OTLP_ENDPOINT)),
+}
+client.tracer = modules.tracing.Tracer(
+    exporters=[trace_exporters[name.strip()]() for name in os.getenv('TRACE_EXPORT', '').split(',') if name.strip() in trace_exporters],
+    slow_ms=float(os.getenv('TRACE_SLOW_MS', '250')),
+    sample_rate=float(os.getenv('TRACE_SAMPLE_RATE', '0')),
+)
+modules.tracing.instrument_http(client.http)
+startup.mark("setup")
+client.scheduler = modules.scheduler.Scheduler()
+modules.maintenance.register(client.scheduler, client)
 
 # --- Helper Functions ---
 async def send_as_webhook(channel, name, content, avatar_url=None):
@@ -34,56 +75,144 @@ async def send_as_webhook(channel, name, content, avatar_url=None):
         await webhook.delete()
         return True
     except discord.Forbidden:
-        print(f"Error: Missing 'Manage Webhooks' permission in {channel.name}")
+        log.warning("Missing 'Manage Webhooks' permission in %s", channel.name)
         return False
     except Exception as e:
-        print(f"Webhook Error: {e}")
+        log.warning("Webhook error: %s", e)
         return False
 
+def get_configs(guild):
+    if guild is None:
+        return client.configs
+    return client.guild_configs.get(guild.id, client.configs)
+
+def reload_default_configs():
+    # Compile fully before swapping, so a broken file leaves the running config untouched
+    try:
+        client.configs = modules.configs.compile_configs(modules.configs.load_configs())
+        return None
+    except modules.configs.ConfigError as e:
+        log.error("Rejected configs: %s", e)
+        return str(e)
+
+async def load_guild_configs(only=None):
+    # Guilds with a #configs channel get their attachments layered over the local files, all guilds at once;
+    # `only` reloads just those guilds and keeps everyone else's configs as they are
+    guilds = [guild for guild in (only or client.guilds) if discord.utils.get(guild.text_channels, name='configs')]
+    results = await asyncio.gather(
+        *(modules.configs.load_configs_from_channel(guild, channel_name='configs', defaults=client.configs.raw) for guild in guilds),
+        return_exceptions=True
+    )
+    guild_configs = {} if only is None else {
+        guild_id: configs for guild_id, configs in client.guild_configs.items() if guild_id not in {guild.id for guild in only}
+    }
+    for guild, result in zip(guilds, results):
+        try:
+            if isinstance(result, Exception):
+                raise result
+            guild_configs[guild.id] = modules.configs.compile_configs(result)
+            log.info("Loaded configurations from 'configs' channel in %s.", guild.name)
+        except Exception as e:
+            log.warning("Failed to load configs from channel in %s: %s. Keeping its previous configurations.", guild.name, e)
+            if guild.id in client.guild_configs:
+                guild_configs[guild.id] = client.guild_configs[guild.id]
+    client.guild_configs = guild_configs
+
+async def run_with_progress(status, label, func, *args):
+    # Runs a blocking transfer in a thread and edits the status message every few seconds
+    done = {"rows": 0}
+    task = asyncio.create_task(asyncio.to_thread(func, *args, progress=lambda rows: done.__setitem__("rows", rows)))
+    while not task.done():
+        await asyncio.wait({task}, timeout=5)
+        if not task.done():
+            await status.edit(content=f"{label}... {done['rows']} rows so far.")
+    return task.result()
+
+async def warn_missing_admin(guild):
+    bot_member = guild.me
+    
+    if not bot_member.guild_permissions.administrator:
+        try:
+            owner = await guild.fetch_member(guild.owner_id)
+            owner_mention = owner.mention
+        except:
+            owner_mention = "Owner"
+
+        warning_msg = (
+            f"⚠️ {owner_mention}, {client.user.name} does not have administrator permissions. "
+            "Some features may not work properly."
+        )
+        mods_channel = discord.utils.get(guild.text_channels, name='moderators-only')
+        general_channel = discord.utils.get(guild.text_channels, name='general')
+        target_channel = mods_channel or general_channel
+
+        if target_channel:
+            # Most likely to fail exactly when the bot is missing permissions, which is why we're warning
+            try:
+                await target_channel.send(warning_msg)
+            except discord.HTTPException as e:
+                log.warning("Could not send the missing-admin warning in %s: %s", guild.name, e)
+
+async def ensure_members(guild):
+    # Commands that look members up by name, id or join time need the full member list
+    if not guild.chunked:
+        await guild.chunk()
+
+async def chunk_guilds():
+    for guild in client.guilds:
+        await ensure_members(guild)
+
 # --- Event Handlers ---
 @client.event
 async def on_ready():
-    print(f'{client.user} has connected to Discord!')
-    print(f"WELCOME TO ASTROMECH!")
-    for guild in client.guilds:
-        bot_member = guild.me
-        
-        if not bot_member.guild_permissions.administrator:
-            try:
-                owner = await guild.fetch_member(guild.owner_id)
-                owner_mention = owner.mention
-            except:
-                owner_mention = "Owner"
-
-            warning_msg = (
-                f"⚠️ {owner_mention}, {client.user.name} does not have administrator permissions. "
-                "Some features may not work properly."
-            )
-            mods_channel = discord.utils.get(guild.text_channels, name='moderators-only')
-            general_channel = discord.utils.get(guild.text_channels, name='general')
-            target_channel = mods_channel or general_channel
+    startup.mark("connect")
+    log.info("%s has connected to Discord!", client.user)
+    log.info("WELCOME TO ASTROMECH!")
+    # Large phishing feeds take a moment to parse, so they load in the background while we come up
+    client.domain_load_task = asyncio.create_task(client.domain_blocklist.load_async())
+    if reload_default_configs() is not None and not hasattr(client, "configs"):
+        raise RuntimeError("Local configs are invalid, refusing to start without them.")
 
-            if target_channel:
-                await target_channel.send(warning_msg)
-        
-        if "configs" in [channel.name for channel in guild.channels]:
-            # client.configs = await modules.configs.load_configs_from_channel(guild, channel_name='configs')
-            # print(f"Loaded configurations from 'configs' channel in {guild.name}.")
-            
-            print(f"Loading configs from channel is currently disabled. Loading default configurations instead. {guild.name}")
-            client.configs = modules.configs.load_configs()
-        else: 
-            client.configs = modules.configs.load_configs()
-            print(f"No configs channel found in {guild.name}. Loaded default configurations.")
-            
-    async with aiosqlite.connect("levels.db") as db:
-        await db.execute("CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY, xp INTEGER, level INTEGER)")
-        await db.commit()
+    # None of these depend on each other, so the databases open while guild configs download and warnings go out
+    # A failure in one is logged rather than skipping the scheduler start below
+    steps = ["storage", "audit log", "guild configs"] + [f"admin check in {guild.name}" for guild in client.guilds]
+    results = await asyncio.gather(
+        client.storage.open(),
+        client.audit.open(),
+        load_guild_configs(),
+        *(warn_missing_admin(guild) for guild in client.guilds),
+        return_exceptions=True
+    )
+    for step, result in zip(steps, results):
+        if isinstance(result, Exception):
+            log.error("Startup step '%s' failed: %s", step, result, exc_info=result)
+
+    client.scheduler.start()
+    client.scheduler.once("chunk_guilds", 0, chunk_guilds)
+    startup.finish()
   
 @client.event
 async def on_message(message):
     if message.author == client.user:
         return
+    with client.tracer.trace("on_message", guild=message.guild.id if message.guild else None, channel=message.channel.id):
+        await dispatch_message(message)
+
+async def dispatch_message(message):
+    command = client.rate_limiter.match_command(message.content)
+    modules.tracing.current().set(command=command or "message")
+    if command:
+        allowed, retry_after, notify = client.rate_limiter.check(
+            command,
+            message.author.id,
+            message.channel.id,
+            message.guild.id if message.guild else None
+        )
+        if not allowed:
+            if notify:
+                wait = "a while" if retry_after == float("inf") else f"{retry_after:.0f}s"
+                await message.reply(f"Slow down! Try {command} again in {wait}.")
+            return
 
     if message.content.startswith('!debug.info'):
         debug_info = f"User: {message.author}\nChannel: {message.channel}\nGuild: {message.guild}"
@@ -96,7 +225,7 @@ async def on_message(message):
         else: 
             async for msg in message.channel.history(limit=None):
                 if msg.author == message.author:
-                    client.wiped_messages.add(msg.id)
+                    client.wiped_messages[msg.id] = time.monotonic()
                     await msg.delete()
     elif message.content.startswith('!boom'):
         the_message = message
@@ -121,25 +250,37 @@ async def on_message(message):
             await message.channel.send(f"@everyone {added_message}")
         await asyncio.sleep(0.25)
     elif message.content.startswith('!config.reload'):
-        client.configs = modules.configs.load_configs()
-        await message.channel.send("Configurations reloaded successfully.")
+        # Re-reads #configs history, so staff only, and only for the guild it was run in
+        if message.guild is None or not (str(message.author.id) == OWNER_ID or get_configs(message.guild).is_staff(message.author)):
+            await message.channel.send("You do not have permission to use this command.")
+            return
+        error = reload_default_configs()
+        await load_guild_configs(only=[message.guild])
+        await client.domain_blocklist.load_async()
+        if error:
+            await message.channel.send(f"Configuration rejected, keeping the previous one: {error}")
+        else:
+            await message.channel.send("Configurations reloaded successfully.")
     elif message.content.startswith('!terminate'):
-        configs = client.configs
+        configs = get_configs(message.guild)
         
-        if (message.author == client.user or any(role.name.lower() in configs["RoleWhitelist"]["guild_staff_roles"] for role in message.author.roles)) or message.author.name.lower() in configs["UserWhitelist"]["whitelisted_users"]:
+        if message.author == client.user or configs.is_staff(message.author):
             content = message.content.replace('!terminate', '').strip()
-            if message.mentions:
-                member = message.mentions[0]
-            else:
-                member = get(message.guild.members, name=content) or \
-                        get(message.guild.members, display_name=content)
+            await ensure_members(message.guild)
+            members = moderation.resolve_targets(message.guild, content, message.mentions, configs, exclude={message.author.id})
 
-            if member:
-                await message.reply(f"Deactivating {member.display_name}... 💀")
-                await member.kick(reason=f"Terminated by {message.author}")
+            if moderation.needs_confirmation(members, content):
+                await message.reply(f"That selects {len(members)} users. Run `!terminate {content} confirm` to kick them all.")
+                return
+            if members:
+                status = await message.reply(f"Deactivating {len(members)} user(s)... 💀")
+                done, failed = await moderation.apply(members, lambda member: member.kick(reason=f"Terminated by {message.author}"))
+                for member in done:
+                    client.audit.record("terminate", message.guild.id, user_id=member.id, actor_id=message.author.id, channel_id=message.channel.id)
+                await status.edit(content=moderation.summarize("Deactivated", done, failed))
             else:
                 await message.channel.send(f"User '{content}' not found.")
-            
+
             await message.delete()
         else:
             await message.reply("You do not have permission to use this command.")
@@ -167,43 +308,140 @@ async def on_message(message):
             await client.close()
         else:
             await message.channel.send("You do not have permission to use this command.")
+    elif message.content.startswith('!xp.export'):
+        if str(message.author.id) != OWNER_ID:
+            await message.channel.send("You do not have permission to use this command.")
+            return
+
+        fmt = "csv" if "csv" in message.content[len('!xp.export'):].lower() else "jsonl"
+        export_dir = Path("./exports")
+        export_dir.mkdir(exist_ok=True)
+        export_path = export_dir / f"xp-{message.guild.id}-{datetime.datetime.now():%Y%m%d-%H%M%S}.{fmt}"
+
+        status = await message.reply("Exporting XP...")
+        with export_path.open("w", encoding="utf-8", newline="") as out:
+            count = await run_with_progress(status, "Exporting XP", xp_transfer.export_xp, client.db_path, out, fmt, message.guild.id)
+
+        # Discord caps uploads, anything bigger stays on disk
+        if export_path.stat().st_size < 8 * 1024 * 1024:
+            await status.edit(content=f"Exported {count} rows.", attachments=[discord.File(export_path)])
+        else:
+            await status.edit(content=f"Exported {count} rows to `{export_path}`.")
+    elif message.content.startswith('!xp.import'):
+        if str(message.author.id) != OWNER_ID:
+            await message.channel.send("You do not have permission to use this command.")
+            return
+        if not message.attachments:
+            await message.reply("Attach a .jsonl or .csv file to import.")
+            return
+
+        attachment = message.attachments[0]
+        import_dir = Path("./exports")
+        import_dir.mkdir(exist_ok=True)
+        import_path = import_dir / f"import-{attachment.id}-{attachment.filename}"
+        await attachment.save(import_path)
+
+        status = await message.reply("Importing XP...")
+        fmt = "csv" if attachment.filename.lower().endswith(".csv") else "jsonl"
+        try:
+            with import_path.open("r", encoding="utf-8", newline="") as source:
+                count, skipped = await run_with_progress(status, "Importing XP", xp_transfer.import_xp, client.db_path, source, fmt, message.guild.id)
+        finally:
+            import_path.unlink(missing_ok=True)
+
+        # Imported rows bypassed the cache
+        client.storage.cache.clear()
+        await status.edit(content=f"Imported {count} rows ({skipped} skipped).")
     elif message.content.startswith('!mute'):
-        configs = client.configs
+        configs = get_configs(message.guild)
 
-        if (message.author == client.user or 
-            any(role.name.lower() in configs["RoleWhitelist"]["guild_staff_roles"] 
-                for role in message.author.roles) or 
-            message.author.name.lower() in configs["UserWhitelist"]["whitelisted_users"]):
+        if message.author == client.user or configs.is_staff(message.author):
 
             content = message.content.replace('!mute', '').strip()
+            await ensure_members(message.guild)
+            members = moderation.resolve_targets(message.guild, content, message.mentions, configs, exclude={message.author.id})
 
-            if message.mentions:
-                member = message.mentions[0]
-            else:
-                member = get(message.guild.members, name=content) or \
-                        get(message.guild.members, display_name=content)
-
-            if member:
-                try:
-                    await message.reply(f"Putting restraining bolt on {member.display_name}... 🤐")
-                    await member.timeout(datetime.timedelta(minutes=10))
-                except discord.errors.Forbidden:
-                    await message.reply("I don't have permission to timeout that user.")
+            if moderation.needs_confirmation(members, content):
+                await message.reply(f"That selects {len(members)} users. Run `!mute {content} confirm` to mute them all.")
+                return
+            if members:
+                status = await message.reply(f"Putting restraining bolts on {len(members)} user(s)... 🤐")
+                done, failed = await moderation.apply(members, lambda member: member.timeout(datetime.timedelta(minutes=10), reason=f"Muted by {message.author}"))
+                for member in done:
+                    client.audit.record("mute", message.guild.id, user_id=member.id, actor_id=message.author.id, channel_id=message.channel.id)
+                await status.edit(content=moderation.summarize("Muted", done, failed))
             else:
                 await message.channel.send(f"User '{content}' not found.")
 
             await message.delete()
+    elif message.content.startswith('!audit'):
+        if not get_configs(message.guild).is_staff(message.author):
+            await message.channel.send("You do not have permission to use this command.")
+            return
+
+        try:
+            query = modules.audit.parse_query(message.content[len('!audit'):])
+        except ValueError as e:
+            await message.reply(f"{e}. Usage: `!audit [user:@member] [pattern:name] [action:mute] [since:2h] [until:30m] [before:id] [text]`")
+            return
+        rows = await client.audit.search(message.guild.id, **query)
+        await message.reply(modules.audit.format_results(rows), allowed_mentions=discord.AllowedMentions.none())
+    elif message.content.startswith('!reload'):
+        if str(message.author.id) != OWNER_ID:
+            await message.channel.send("You do not have permission to use this command.")
+            return
+
+        # "!reload leveling" or "!reload" for every handler module; client state and caches are untouched
+        names = [name if name.startswith("modules.") else f"modules.{name}" for name in message.content[len('!reload'):].split()]
+        try:
+            reloaded, elapsed = modules.reloader.reload_modules(names or modules.reloader.RELOADABLE)
+            await message.reply(f"Reloaded {', '.join(reloaded)} in {elapsed * 1000:.0f}ms.")
+        except modules.reloader.ReloadError as e:
+            await message.reply(f"Reload failed, still running the previous code: {e}")
+    elif message.content.startswith('!backup'):
+        if str(message.author.id) != OWNER_ID:
+            await message.channel.send("You do not have permission to use this command.")
+            return
+
+        status = await message.reply("Backing up levels database...")
+        if await client.scheduler.run_now("backup_levels_db"):
+            await status.edit(content=modules.backup.describe(client.last_backup))
+        else:
+            error = client.scheduler.jobs["backup_levels_db"].last_error or "a backup is already running"
+            await status.edit(content=f"Backup failed: {error}")
+    elif message.content.startswith('!traces'):
+        if str(message.author.id) != OWNER_ID:
+            await message.channel.send("You do not have permission to use this command.")
+            return
+
+        count = message.content[len('!traces'):].strip()
+        traces = client.tracer.slowest(int(count) if count.isdigit() else 3)
+        stats = client.tracer.stats()
+        summary = f"{stats['kept']} of {stats['seen']} traces were slower than {client.tracer.slow_ms:.0f}ms."
+        report = "\n\n".join(modules.tracing.format_trace(spans) for spans in traces)
+        await message.reply(f"{summary}\n{report}"[:2000], allowed_mentions=discord.AllowedMentions.none())
     elif message.content.startswith('!checkrank'):
-        client.ranks = ["Ensign", "Lieutenant", "Lieutenant Commander", "Commander", "Captain", "Vice Admiral", "Admiral", "Fleet Admiral"]
-        rank = await modules.leveling.get_user_level(message.author.id, client.db_path, client.configs)
-        rank = client.ranks[rank - 1]
+        xp, level = await modules.leveling.get_user_level(message.guild.id, message.author.id, client.storage, get_configs(message.guild))
+        rank = modules.ranks.rank_for_level(level)
 
-        role = discord.utils.get(message.guild.roles, name=rank)
+        role = client.rank_roles.role_for_level(message.guild, level)
 
-        if message.guild.get_role(rank) is not None:
+        if role is not None:
             await message.reply(f"Your current rank is: {role.mention}")
         else:
             await message.reply(f"Your current rank is: {rank}")
+    elif message.content.startswith('!ranks.sync'):
+        if not get_configs(message.guild).is_staff(message.author):
+            await message.channel.send("You do not have permission to use this command.")
+            return
+
+        status = await message.reply("Syncing rank roles...")
+        result = await client.rank_roles.resync_guild(message.guild, client.storage)
+        if result is None:
+            await status.edit(content="A rank sync is already running for this server.")
+        else:
+            checked, changed = result
+            await status.edit(content=f"Checked {checked} members, updated rank roles for {changed}.")
     elif message.content.startswith(client.user.mention) or message.content.startswith(f"<@!{client.user.id}>"):
         responses = [
             "Bleep-bloop!","Beep-beep! Boop-beep!","Ee-oo-brrt","Bleep-bloop-whistle","Boop-brrt-zzt!",
@@ -217,37 +455,70 @@ async def on_message(message):
         response = responses[response]
         await message.reply(f"{response}")
     else:
-        print("No command, sending to message handler...")
-        await modules.message_handler.handle_message(message, client.configs, client)
+        log.debug("No command, sending to message handler...")
+        await modules.message_handler.handle_message(message, get_configs(message.guild), client)
+
+async def send_welcome(guild, members, extra):
+    welcome_channel = discord.utils.get(guild.text_channels, name='general')
+    if welcome_channel:
+        mentions = ", ".join(member.mention for member in members)
+        if extra:
+            mentions += f" and {extra} others"
+        if str(guild.name).lower() == "the open circle fleet":
+            await welcome_channel.send(f'Welcome aboard the Negotiator, {mentions}!')
+        else: await welcome_channel.send(f'Welcome aboard, {mentions}!')
+
+async def announce_raid(guild, raiding):
+    moderators_channel = discord.utils.get(guild.text_channels, name='moderators-only')
+    if moderators_channel:
+        if raiding:
+            await moderators_channel.send(f"🚨 Join storm detected: {client.join_aggregator.join_rate(guild.id)} joins in the last minute. Welcomes are being batched. Use `!terminate joined:10m` or `!mute joined:10m` to respond.")
+        else:
+            await moderators_channel.send("Join rate is back to normal.")
+
+client.join_aggregator = modules.joins.JoinAggregator(send_welcome)
+client.join_aggregator.subscribe(announce_raid)
 
 @client.event
 async def on_member_join(member):
-    welcome_channel = discord.utils.get(member.guild.text_channels, name='general')
-    if welcome_channel:
-        if str(member.guild.name).lower() == "the open circle fleet":
-            await welcome_channel.send(f'Welcome aboard the Negotiator, {member.mention}!')
-        else: await welcome_channel.send(f'Welcome aboard, {member.mention}!')   
-        
+    with client.tracer.trace("on_member_join", guild=member.guild.id):
+        await client.join_aggregator.member_joined(member)
+
+# Rank role ids are cached per guild, any role change means resolving them again
+@client.event
+async def on_guild_role_create(role):
+    client.rank_roles.invalidate(role.guild.id)
+
+@client.event
+async def on_guild_role_update(before, after):
+    client.rank_roles.invalidate(after.guild.id)
+
+@client.event
+async def on_guild_role_delete(role):
+    client.rank_roles.invalidate(role.guild.id)
+
 @client.event
 async def on_message_delete(message):
+    with client.tracer.trace("on_message_delete", guild=message.guild.id if message.guild else None, channel=message.channel.id):
+        await repost_deleted_message(message)
+
+async def repost_deleted_message(message):
     permissions = message.channel.permissions_for(message.guild.me)
-    configs = client.configs
-    
-    staff_roles = configs["RoleWhitelist"]["guild_staff_roles"]
-    trusted_roles = configs["RoleWhitelist"]["guild_trusted_roles"]
-    whitelisted_users = configs["UserWhitelist"]["whitelisted_users"]
+    configs = get_configs(message.guild)
     
-    whitelisted_roles = {
-        r.lower() for r in (staff_roles + trusted_roles)
-    }
-    
-    if message.id in client.wiped_messages:
-            client.wiped_messages.remove(message.id)
+    if client.wiped_messages.pop(message.id, None) is not None:
             return
+
+    if modules.message_handler.contains_whitelisted_phrase(message.content, configs):
+        return
+
+    if message.author != client.user:
+        client.audit.record("message_deleted", message.guild.id, user_id=message.author.id, channel_id=message.channel.id,
+                            message_id=message.id, content=message.content)
     
     if permissions.manage_webhooks:
-        #                                                                                                                  this errors sometimes idk why but it does and it's only happened once
-        if (message.author == client.user or message.author.name.lower() in {u.lower() for u in whitelisted_users} or any(role.name.lower() in whitelisted_roles for role in message.author.roles)): 
+        # Authors who have since left the guild come through as a User with no roles
+        if message.author == client.user or configs.is_whitelisted(message.author):
             return
         
         logs_channel = discord.utils.get(message.guild.text_channels, name='logs')
@@ -256,7 +527,7 @@ async def on_message_delete(message):
             await logs_channel.send(f'{message.author.mention}: "{message.content}"')
         
         if msg_channel:
-            print(message.author.display_name, message.author, message.author.name)
+            log.debug("Reposting deleted message by %s (%s, %s)", message.author.display_name, message.author, message.author.name)
             
             if str(message.author) == str(message.author.display_name):
                 await send_as_webhook(
@@ -273,11 +544,17 @@ async def on_message_delete(message):
                     avatar_url=message.author.avatar.url if message.author.avatar else None
                 )
     else:
-        print(f"Warning: Missing 'Manage Webhooks' permission in {message.channel.name}. Falling back to regular message logging.")
+        log.warning("Missing 'Manage Webhooks' permission in %s. Falling back to regular message logging.", message.channel.name)
         await message.channel.send(f'<{message.author.mention}> "{message.content}"')
         
         
 async def on_shutdown():
+    await client.scheduler.shutdown()
+    client.join_aggregator.shutdown()
+    client.scanner.shutdown()
+    await client.storage.close()
+    await client.audit.close()
+    client.tracer.shutdown()
     for guild in client.guilds:
         moderators_channel = discord.utils.get(guild.text_channels, name='moderators-only')
         general_channel = discord.utils.get(guild.text_channels, name='general')
@@ -288,6 +565,10 @@ async def on_shutdown():
             try:
                 await target_channel.send(warning_msg)
             except Exception as e:
-                print(f"Failed to send shutdown warning to channel {target_channel.name}: {e}")
+                log.warning("Failed to send shutdown warning to channel %s: %s", target_channel.name, e)
 
-client.run(TOKEN)
\ No newline at end of file
+# Spawned scan workers import this file as __mp_main__ and must not start a second bot
+if __name__ == "__main__":
+    # discord.py would otherwise add its own synchronous stderr handler
+    client.run(TOKEN, log_handler=None)
+    modules.logs.shutdown()
\ No newline at end of file
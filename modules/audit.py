@@ -0,0 +1,220 @@
+import asyncio, logging, re, time, aiosqlite
+
+log = logging.getLogger(__name__)
+
+AUDIT_DB_PATH = "./configs/audit.db"
+
+# Events older than this are pruned by the maintenance job
+RETENTION_DAYS = 90
+
+FIELDS = ("created_at", "guild_id", "channel_id", "user_id", "actor_id", "action", "pattern", "message_id", "content")
+
+# External-content FTS5 table, so message text is stored once; the trigger keeps the index in step with inserts
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER,
+    user_id INTEGER,
+    actor_id INTEGER,
+    action TEXT NOT NULL,
+    pattern TEXT,
+    message_id INTEGER,
+    content TEXT
+);
+CREATE INDEX IF NOT EXISTS events_guild ON events (guild_id, id);
+CREATE INDEX IF NOT EXISTS events_guild_user ON events (guild_id, user_id, id);
+CREATE INDEX IF NOT EXISTS events_guild_pattern ON events (guild_id, pattern, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5 (content, content='events', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS events_ai AFTER INSERT ON events BEGIN
+    INSERT INTO events_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS events_ad AFTER DELETE ON events BEGIN
+    INSERT INTO events_fts (events_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+_DURATION = re.compile(r"^(\d+)([smhdw])$", re.IGNORECASE)
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+_MENTION = re.compile(r"^<@!?(\d+)>$")
+
+class AuditLog:
+    # record() only appends to a list; a background task writes the list out in one transaction per batch
+    def __init__(self, path=AUDIT_DB_PATH, batch_size=500, flush_interval=1.0, max_pending=50000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.db = None
+        self.pending = []
+        self.dropped = 0
+        self.written = 0
+        self._wakeup = None
+        self._writer = None
+        self._closing = False
+        self._lock = asyncio.Lock()
+
+    async def open(self):
+        async with self._lock:
+            if self.db is None:
+                db = await aiosqlite.connect(self.path)
+                await db.execute("PRAGMA journal_mode = WAL")
+                await db.execute("PRAGMA synchronous = NORMAL")
+                await db.executescript(_SCHEMA)
+                await db.commit()
+                self.db = db
+            if self._writer is None or self._writer.done():
+                self._closing = False
+                self._wakeup = asyncio.Event()
+                self._writer = asyncio.create_task(self._write_loop(), name="audit-writer")
+        return self.db
+
+    async def close(self):
+        # The writer is asked to stop rather than cancelled, so a batch is never cut off mid-insert
+        if self._writer is not None:
+            self._closing = True
+            self._wakeup.set()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        if self.db is not None:
+            await self.flush()
+            await self.db.close()
+            self.db = None
+
+    def record(self, action, guild_id, user_id=None, actor_id=None, channel_id=None, pattern=None, message_id=None, content=None):
+        # Safe to call from the message path: no I/O, no await
+        if len(self.pending) >= self.max_pending:
+            # A raid that outruns the disk loses its oldest unwritten events rather than growing without bound
+            del self.pending[:self.batch_size]
+            self.dropped += self.batch_size
+        self.pending.append((time.time(), guild_id, channel_id, user_id, actor_id, action, pattern, message_id, content))
+        if len(self.pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self):
+        if not self.pending or self.db is None:
+            return 0
+        batch, self.pending = self.pending, []
+        try:
+            await self.db.executemany(f"INSERT INTO events ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})", batch)
+            await self.db.commit()
+        except Exception:
+            # Put the batch back so the next flush retries it
+            self.pending[:0] = batch
+            raise
+        self.written += len(batch)
+        return len(batch)
+
+    async def _write_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("Failed to write %d audit events", len(self.pending))
+            if self._closing:
+                return
+
+    async def search(self, guild_id, user_id=None, pattern=None, action=None, since=None, until=None, text=None, before_id=None, limit=10):
+        # Newest first, paged by id so page N costs the same as page 1
+        db = self.db or await self.open()
+        await self.flush()
+
+        clauses = ["e.guild_id = ?"]
+        params = [guild_id]
+        for column, value in (("e.user_id", user_id), ("e.pattern", pattern), ("e.action", action)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("e.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("e.created_at < ?")
+            params.append(until)
+        if before_id is not None:
+            clauses.append("e.id < ?")
+            params.append(before_id)
+
+        if text:
+            # One quoted FTS5 phrase with a prefix on the last word, so user input is never query syntax
+            clauses.append("e.id IN (SELECT rowid FROM events_fts WHERE events_fts MATCH ?)")
+            params.append('"' + text.replace('"', '""') + '" *')
+
+        query = (
+            "SELECT e.id, e.created_at, e.user_id, e.actor_id, e.action, e.pattern, e.content "
+            f"FROM events AS e WHERE {' AND '.join(clauses)} ORDER BY e.id DESC LIMIT ?"
+        )
+        async with db.execute(query, (*params, limit)) as cursor:
+            return await cursor.fetchall()
+
+    async def prune(self, days=RETENTION_DAYS):
+        db = self.db or await self.open()
+        cutoff = time.time() - days * 86400
+        cursor = await db.execute("DELETE FROM events WHERE created_at < ?", (cutoff,))
+        await db.commit()
+        return cursor.rowcount
+
+    def stats(self):
+        return {"pending": len(self.pending), "written": self.written, "dropped": self.dropped}
+
+def parse_duration(value):
+    match = _DURATION.match(value)
+    if not match:
+        raise ValueError(f"'{value}' is not a duration like 30m, 12h or 7d")
+    return int(match.group(1)) * _UNITS[match.group(2).lower()]
+
+def parse_query(content, now=None):
+    # "!audit user:@x pattern:discord_invite since:2h before:1234 some text" -> search() keyword arguments
+    now = now or time.time()
+    query = {}
+    words = []
+    for token in content.split():
+        key, _, value = token.partition(":")
+        key = key.lower()
+        if not value or key not in ("user", "pattern", "action", "since", "until", "before"):
+            words.append(token)
+        elif key == "user":
+            mention = _MENTION.match(value)
+            query["user_id"] = int(mention.group(1) if mention else value)
+        elif key in ("pattern", "action"):
+            query[key] = value
+        elif key in ("since", "until"):
+            query[key] = now - parse_duration(value)
+        else:
+            query["before_id"] = int(value)
+    if words:
+        query["text"] = " ".join(words)
+    return query
+
+def format_results(rows, limit=10, width=80, max_length=2000):
+    # Discord rejects replies over 2000 characters, so rows that don't fit are left for the next page
+    if not rows:
+        return "No matching audit events."
+    lines = []
+    length = 0
+    footer_room = len("\nMore: add `before:` to see older events.") + 20
+    for event_id, created_at, user_id, actor_id, action, pattern, content in rows:
+        line = f"`#{event_id}` <t:{int(created_at)}:f> **{action}**"
+        if user_id:
+            line += f" <@{user_id}>"
+        if actor_id:
+            line += f" by <@{actor_id}>"
+        if pattern:
+            line += f" [{pattern}]"
+        if content:
+            snippet = content.replace("\n", " ").replace("`", "'")
+            line += f": `{snippet[:width]}{'…' if len(snippet) > width else ''}`"
+        if lines and length + len(line) + 1 + footer_room > max_length:
+            break
+        lines.append(line)
+        length += len(line) + 1
+    shown = len(lines)
+    if shown < len(rows) or len(rows) == limit:
+        lines.append(f"More: add `before:{rows[shown - 1][0]}` to see older events.")
+    return "\n".join(lines)
@@ -0,0 +1,100 @@
+import asyncio, gzip, logging, os, shutil, sqlite3, time
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+BACKUP_DIR = "./backups"
+
+# Pages copied per step and the pause between steps; each step holds the read lock only briefly
+STEP_PAGES = 256
+STEP_SLEEP = 0.005
+
+# Backups restart whenever another connection writes mid-copy. After this many restarts the rest is
+# copied in one step instead, which under WAL is a read snapshot and still never blocks writers.
+MAX_RESTARTS = 3
+
+class _Restarted(Exception):
+    pass
+
+def _copy(source, target, pages, sleep):
+    # Returns how often the copy restarted; falls back to a single step if writes keep restarting it
+    state = {"previous": None, "restarts": 0}
+
+    def progress(status, remaining, total):
+        if state["previous"] is not None and remaining >= state["previous"]:
+            state["restarts"] += 1
+            if state["restarts"] >= MAX_RESTARTS:
+                raise _Restarted()
+        state["previous"] = remaining
+
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+    except _Restarted:
+        log.info("Backup restarted %d times under write load, finishing in one step.", state["restarts"])
+        source.backup(target, pages=-1)
+    return state["restarts"]
+
+def _compress(path):
+    compressed = path.with_name(path.name + ".gz")
+    with open(path, "rb") as raw, gzip.open(compressed, "wb", compresslevel=6) as out:
+        shutil.copyfileobj(raw, out, 1024 * 1024)
+    path.unlink()
+    return compressed
+
+def _rotate(directory, stem, keep):
+    # Newest first by name, which sorts by the timestamp in it
+    backups = sorted((p for p in directory.glob(f"{stem}-*.db*") if not p.name.endswith(".partial")), reverse=True)
+    for old in backups[keep:]:
+        old.unlink()
+    return len(backups[keep:])
+
+def backup_database(db_path, backup_dir=BACKUP_DIR, keep=7, compress=True, pages=STEP_PAGES, sleep=STEP_SLEEP):
+    # Blocking; run it in a thread. Uses its own connections so the bot's connection is never held up.
+    start = time.perf_counter()
+    db_path = Path(db_path)
+    directory = Path(backup_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    final = directory / f"{db_path.stem}-{time.strftime('%Y%m%d-%H%M%S')}.db"
+    partial = final.with_name(final.name + ".partial")
+
+    source = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+    target = sqlite3.connect(partial)
+    try:
+        restarts = _copy(source, target, pages, sleep)
+        copy_seconds = time.perf_counter() - start
+        (page_count,) = target.execute("PRAGMA page_count").fetchone()
+        (integrity,) = target.execute("PRAGMA integrity_check").fetchone()
+        if integrity != "ok":
+            raise sqlite3.DatabaseError(f"backup of {db_path} failed integrity check: {integrity}")
+    except Exception:
+        target.close()
+        partial.unlink(missing_ok=True)
+        raise
+    finally:
+        target.close()
+        source.close()
+
+    os.replace(partial, final)
+    if compress:
+        final = _compress(final)
+    removed = _rotate(directory, db_path.stem, keep)
+
+    return {
+        "path": str(final),
+        "pages": page_count,
+        "restarts": restarts,
+        "copy_seconds": copy_seconds,
+        "total_seconds": time.perf_counter() - start,
+        "bytes": final.stat().st_size,
+        "removed": removed,
+    }
+
+async def backup_async(db_path, **kwargs):
+    return await asyncio.to_thread(backup_database, db_path, **kwargs)
+
+def describe(result):
+    return (
+        f"Backed up {result['pages']} pages to `{result['path']}` ({result['bytes'] / 1e6:.1f}MB) "
+        f"in {result['total_seconds']:.1f}s (copy {result['copy_seconds'] * 1000:.0f}ms, {result['restarts']} restarts, "
+        f"{result['removed']} old backups removed)."
+    )
@@ -0,0 +1,63 @@
+import json, hashlib, logging, discord
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+SYNC_STATE_PATH = Path("./configs/command_sync.state")
+
+def _command_payload(command, tree):
+    # discord.py >= 2.4 takes the tree so it can resolve translations, older versions take nothing
+    try:
+        return command.to_dict(tree)
+    except TypeError:
+        return command.to_dict()
+
+def compute_tree_hash(tree, guild=None):
+    payload = [_command_payload(command, tree) for command in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda c: (c.get("type", 1), c.get("name", "")))
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+def load_sync_state(path=SYNC_STATE_PATH):
+    try:
+        with Path(path).open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError as e:
+        log.warning("Error parsing %s: %s. Forcing a full command sync.", Path(path).name, e)
+        return {}
+
+def save_sync_state(state, path=SYNC_STATE_PATH):
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(state, f, indent=4, sort_keys=True)
+    tmp_path.replace(path)
+
+async def sync_if_changed(tree, dev_guild_id=None, force=False, path=SYNC_STATE_PATH):
+    # A dev guild gets a copy of the global commands; guild syncs apply instantly and are cheap
+    if dev_guild_id:
+        guild = discord.Object(id=int(dev_guild_id))
+        tree.copy_global_to(guild=guild)
+        scope = f"guild:{guild.id}"
+    else:
+        guild = None
+        scope = "global"
+
+    state = load_sync_state(path)
+    tree_hash = compute_tree_hash(tree, guild=guild)
+
+    if not force and state.get(scope) == tree_hash:
+        log.info("Command tree unchanged for %s, skipping sync.", scope)
+        return False
+
+    synced = await tree.sync(guild=guild)
+    state[scope] = tree_hash
+    try:
+        save_sync_state(state, path)
+    except OSError as e:
+        log.warning("Failed to save command sync state: %s", e)
+
+    log.info("Synced %d commands to %s.", len(synced), scope)
+    return True
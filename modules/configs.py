@@ -1,6 +1,31 @@
-import json, discord
+import json, logging, re, discord, asyncio, hashlib, modules.patterns as patterns, modules.phrases as phrases
+from dataclasses import dataclass
 from pathlib import Path
 
+log = logging.getLogger(__name__)
+
+CHANNEL_CACHE_PATH = Path("./configs/channel_cache")
+
+class ConfigError(ValueError):
+    pass
+
+@dataclass(frozen=True, slots=True)
+class CompiledConfig:
+    raw: dict
+    staff_roles: frozenset
+    trusted_roles: frozenset
+    whitelisted_roles: frozenset
+    whitelisted_users: frozenset
+    blocked_formats: dict
+    pattern_set: patterns.PatternSet
+    phrase_matcher: phrases.PhraseMatcher
+
+    def is_staff(self, member):
+        return member.name.lower() in self.whitelisted_users or any(role.name.lower() in self.staff_roles for role in getattr(member, "roles", ()))
+
+    def is_whitelisted(self, member):
+        return member.name.lower() in self.whitelisted_users or any(role.name.lower() in self.whitelisted_roles for role in getattr(member, "roles", ()))
+
 def load_configs():
     configs = {}
     config_path = Path("./configs")
@@ -10,34 +35,207 @@ def load_configs():
             with file.open("r", encoding="utf-8") as f:
                 configs[file.stem] = json.load(f)
         except json.JSONDecodeError as e:
-            print(f"Error parsing {file.name}: {e}")
+            log.error("Error parsing %s: %s", file.name, e)
 
     return configs
 
-async def load_configs_from_channel(guild, channel_name='configs'):
-    configs = {}
-    configs_channel = discord.utils.get(guild.text_channels, name=channel_name)
-    
-    if configs_channel:
+def _require(configs, name, key, kind):
+    section = configs.get(name)
+    if not isinstance(section, dict):
+        raise ConfigError(f"{name}.json is missing or is not a JSON object")
+    value = section.get(key)
+    if not isinstance(value, kind):
+        raise ConfigError(f"{name}.json: '{key}' must be a {'list' if kind is list else 'object'}")
+    return value
+
+def _strings(values, name, key):
+    if not all(isinstance(v, str) for v in values):
+        raise ConfigError(f"{name}.json: every entry in '{key}' must be a string")
+    return frozenset(v.lower() for v in values)
+
+def _number(value):
+    # bool is an int to Python, but "workers": true is still a mistake
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+# blockedFormats.settings key -> (check, what the error says it must be)
+_SETTINGS = {
+    "engine": (lambda v: v in ("auto", "re", "re2", "regex"), "one of auto, re, re2, regex"),
+    "time_budget_ms": (lambda v: _number(v) and v > 0, "a number above 0"),
+    "max_scan_length": (lambda v: _integer(v) and v >= 0, "a whole number, 0 or more"),
+    "allow_unbounded_patterns": (lambda v: isinstance(v, bool), "true or false"),
+    "worker_mode": (lambda v: v in ("auto", "thread", "process"), "one of auto, thread, process"),
+    "workers": (lambda v: _integer(v) and v >= 1, "a whole number, 1 or more"),
+    "offload_length": (lambda v: _integer(v) and v >= 0, "a whole number, 0 or more"),
+    "offload_pattern_count": (lambda v: _integer(v) and v >= 0, "a whole number, 0 or more"),
+}
+
+def _check_settings(settings):
+    if not isinstance(settings, dict):
+        raise ConfigError("blockedFormats.json: 'settings' must be an object")
+    for key, value in settings.items():
+        if key not in _SETTINGS:
+            log.warning("blockedFormats.json: unknown setting '%s' is ignored.", key)
+            continue
+        check, expected = _SETTINGS[key]
+        if not check(value):
+            raise ConfigError(f"blockedFormats.json: setting '{key}' must be {expected}, got {value!r}")
+
+def compile_configs(configs):
+    # Validates the raw JSON and precomputes everything handlers need, so a bad file fails here and not mid-message
+    staff_roles = _strings(_require(configs, "RoleWhitelist", "guild_staff_roles", list), "RoleWhitelist", "guild_staff_roles")
+    trusted_roles = _strings(_require(configs, "RoleWhitelist", "guild_trusted_roles", list), "RoleWhitelist", "guild_trusted_roles")
+    whitelisted_users = _strings(_require(configs, "UserWhitelist", "whitelisted_users", list), "UserWhitelist", "whitelisted_users")
+
+    blocked_patterns = _require(configs, "blockedFormats", "blocked_patterns", dict)
+    for name, pattern in blocked_patterns.items():
+        if not isinstance(pattern, dict) or not isinstance(pattern.get("regex"), str):
+            raise ConfigError(f"blockedFormats.json: pattern '{name}' needs a 'regex' string")
+        try:
+            re.compile(pattern["regex"])
+        except re.error as e:
+            raise ConfigError(f"blockedFormats.json: pattern '{name}' does not compile: {e}")
+    _check_settings(configs["blockedFormats"].get("settings", {}))
+
+    phrase_config = configs.get("deletionPhraseWhitelist") or {}
+    if not isinstance(phrase_config, dict) or not isinstance(phrase_config.get("phrases", []), list):
+        raise ConfigError("deletionPhraseWhitelist.json: 'phrases' must be a list")
+    _strings(phrase_config.get("phrases", []), "deletionPhraseWhitelist", "phrases")
+
+    return CompiledConfig(
+        raw=configs,
+        staff_roles=staff_roles,
+        trusted_roles=trusted_roles,
+        whitelisted_roles=staff_roles | trusted_roles,
+        whitelisted_users=whitelisted_users,
+        blocked_formats=configs["blockedFormats"],
+        pattern_set=patterns.get_pattern_set(configs["blockedFormats"]),
+        phrase_matcher=phrases.get_phrase_matcher(phrase_config)
+    )
+
+def _index_path(cache_dir):
+    return cache_dir / "index.json"
+
+def _load_index(cache_dir):
+    try:
+        with _index_path(cache_dir).open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_index(cache_dir, index):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = _index_path(cache_dir).with_suffix(".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(index, f, indent=4)
+    tmp_path.replace(_index_path(cache_dir))
+
+# (guild_id, name) -> (sha256, parsed config); handing back the same object keeps compiled patterns cached
+_channel_memo = {}
+
+async def _fetch_attachment(guild_id, name, attachment, cache_dir, index, semaphore):
+    entry = index.get(name)
+    memo = _channel_memo.get((guild_id, name))
+
+    if entry and entry["attachment_id"] == attachment.id:
+        if memo and memo[0] == entry["sha256"]:
+            return name, memo[1], entry
+        try:
+            with (cache_dir / entry["file"]).open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            _channel_memo[(guild_id, name)] = (entry["sha256"], data)
+            return name, data, entry
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    async with semaphore:
+        content = await attachment.read()
+    digest = hashlib.sha256(content).hexdigest()
+    new_entry = {"attachment_id": attachment.id, "sha256": digest, "file": f"{attachment.id}.json"}
+
+    # Re-uploads of the same file get a new attachment id but the same bytes
+    if memo and memo[0] == digest:
+        data = memo[1]
+    else:
+        data = json.loads(content)
+        _channel_memo[(guild_id, name)] = (digest, data)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    (cache_dir / new_entry["file"]).write_bytes(content)
+    if entry and entry["file"] != new_entry["file"]:
+        (cache_dir / entry["file"]).unlink(missing_ok=True)
+    return name, data, new_entry
+
+async def _can_publish_configs(guild, author):
+    # Configs decide what gets deleted and who counts as staff, so only the owner, server managers or the bot may set them
+    if author.id == guild.owner_id or (guild.me is not None and author.id == guild.me.id):
+        return True
+    member = author if isinstance(author, discord.Member) else guild.get_member(author.id)
+    if member is None:
+        # History comes back with plain Users until the member list is chunked, which now happens after startup
         try:
-            async for message in configs_channel.history(limit=100):
-                if message.attachments:
-                    attachment = message.attachments[0]
-                    if attachment.filename.endswith('.json'):
-                        file_content = await attachment.read()
-                        try:
-                            config_data = json.loads(file_content)
-                            config_name = attachment.filename[:-5]
-                            configs[config_name] = config_data
-                        except json.JSONDecodeError as e:
-                            print(f"Error parsing {attachment.filename}: {e}")
-                    else:
-                        print(f"Skipping {attachment.filename}: Not a JSON file.")
+            member = await guild.fetch_member(author.id)
+        except discord.HTTPException:
+            return False
+    permissions = member.guild_permissions
+    return permissions.manage_guild or permissions.administrator
+
+async def load_configs_from_channel(guild, channel_name='configs', defaults=None, max_concurrency=8):
+    # Channel attachments override the local files key by key; anything missing or broken keeps the default
+    if defaults is None:
+        defaults = load_configs()
+    configs = dict(defaults)
+    configs_channel = discord.utils.get(guild.text_channels, name=channel_name)
+    if not configs_channel:
+        return configs
+
+    latest = {}
+    # author id -> may publish; one member lookup per author, not per upload
+    publishers = {}
+    try:
+        async for message in configs_channel.history(limit=100):
+            if not message.attachments:
+                continue
+            if message.author.id not in publishers:
+                publishers[message.author.id] = await _can_publish_configs(guild, message.author)
+            if not publishers[message.author.id]:
+                log.warning("Ignoring config upload by %s in #%s of %s: not the owner or a server manager.", message.author, channel_name, guild.name)
+                continue
+            for attachment in message.attachments:
+                if attachment.filename.endswith('.json'):
+                    # History is newest first, so the first upload of a name wins
+                    latest.setdefault(attachment.filename[:-5], attachment)
                 else:
-                    print(f"Skipping message {message.id}: No attachments found.")
-        except Exception as e:
-            print(f"Error loading configs from channel: {e}")
-            
+                    log.info("Skipping %s: Not a JSON file.", attachment.filename)
+    except Exception as e:
+        log.error("Error loading configs from channel: %s", e)
+        return configs
+
+    cache_dir = CHANNEL_CACHE_PATH / str(guild.id)
+    index = _load_index(cache_dir)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results = await asyncio.gather(
+        *(_fetch_attachment(guild.id, name, attachment, cache_dir, index, semaphore) for name, attachment in latest.items()),
+        return_exceptions=True
+    )
+
+    for (name, attachment), result in zip(latest.items(), results):
+        if isinstance(result, Exception):
+            log.warning("Error loading %s from #%s in %s: %s. Using the default.", attachment.filename, channel_name, guild.name, result)
+            continue
+        _, data, entry = result
+        configs[name] = data
+        index[name] = entry
+
+    try:
+        _save_index(cache_dir, index)
+    except OSError as e:
+        log.warning("Failed to save config cache index for %s: %s", guild.name, e)
+
+    return configs
+
 def load_member_configs(guild):
     member_configs = {}
     for member in guild.members:
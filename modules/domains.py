@@ -0,0 +1,178 @@
+import asyncio, logging, os, re, sys, time
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+DOMAIN_LIST_PATH = Path("./configs/blockedDomains.txt")
+
+# The scheme is capped so a long run of letters with no "://" can't backtrack quadratically
+_URL_HOST_RE = re.compile(r"[a-z][a-z0-9+.-]{0,15}://(?:[^@/\s]*@)?([^/\s:?#<>]+)", re.IGNORECASE)
+_BARE_HOST_RE = re.compile(r"(?<![\w@.-])((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z][a-z0-9-]{1,62})\b", re.IGNORECASE)
+_HOSTS_PREFIXES = ("0.0.0.0", "127.0.0.1", "::")
+# How much of the already-read file is re-checked before trusting a size increase as an append
+_FINGERPRINT_BYTES = 4096
+
+def extract_hosts(text):
+    # Every host a message links to, with or without a scheme; lowercase and without a trailing dot
+    if "." not in text:
+        return set()
+    hosts = {m.group(1) for m in _URL_HOST_RE.finditer(text)} if "://" in text else set()
+    hosts.update(m.group(1) for m in _BARE_HOST_RE.finditer(text))
+    return {h.lower().rstrip(".") for h in hosts}
+
+def _parse_line(line):
+    # Plain domain lists, hosts files and adblock-style "||domain^" entries all show up in public feeds
+    line = line.split("#", 1)[0].strip()
+    if not line:
+        return None
+    parts = line.split()
+    if len(parts) > 1 and parts[0] in _HOSTS_PREFIXES:
+        line = parts[1]
+    line = line.removeprefix("||").removesuffix("^").removeprefix("*.").lower().rstrip(".")
+    return line or None
+
+class DomainBlocklist:
+    def __init__(self, path=DOMAIN_LIST_PATH):
+        self.path = Path(path)
+        self.domains = frozenset()
+        self.loaded_bytes = 0
+        self.loaded_mtime = None
+        self.loaded_inode = None
+        self.loaded_fingerprint = None
+        self.lookups = 0
+        self.hits = 0
+        self.load_seconds = 0.0
+
+    def _fingerprint(self, f, end):
+        f.seek(max(0, end - _FINGERPRINT_BYTES))
+        return hash(f.read(min(end, _FINGERPRINT_BYTES)))
+
+    def _read(self, offset=0, tail=False):
+        # Returns the domains read, where the next tail read should start, and a fingerprint of everything before it
+        added = set()
+        end = offset
+        with self.path.open("rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # A tail read leaves a half-written last line for the next reload. A full load keeps it,
+                    # but still re-reads it next time in case it was still being written.
+                    if not tail:
+                        domain = _parse_line(line.decode("utf-8", errors="ignore"))
+                        if domain:
+                            added.add(domain)
+                    break
+                end += len(line)
+                domain = _parse_line(line.decode("utf-8", errors="ignore"))
+                if domain:
+                    added.add(domain)
+            fingerprint = self._fingerprint(f, end)
+        return added, end, fingerprint
+
+    def _appended(self, stat):
+        # Growth alone is not proof of an append: the file may have been replaced or rewritten with more lines
+        if self.loaded_mtime is None or self.loaded_bytes == 0 or stat.st_size <= self.loaded_bytes:
+            return False
+        if stat.st_ino != self.loaded_inode:
+            return False
+        with self.path.open("rb") as f:
+            return self._fingerprint(f, self.loaded_bytes) == self.loaded_fingerprint
+
+    def load(self):
+        # A file that only grew, with the part already read unchanged, is treated as appended and only its
+        # new tail is read; anything else rebuilds the whole set and swaps it in
+        start = time.perf_counter()
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            self.domains = frozenset()
+            self.loaded_bytes, self.loaded_mtime = 0, None
+            self.loaded_inode = self.loaded_fingerprint = None
+            return 0
+
+        if stat.st_mtime == self.loaded_mtime and stat.st_size == self.loaded_bytes:
+            return 0
+
+        if self._appended(stat):
+            added, end, fingerprint = self._read(self.loaded_bytes, tail=True)
+            added -= self.domains
+            new_domains = self.domains | added
+        else:
+            new_domains, end, fingerprint = self._read()
+            added = new_domains - self.domains
+
+        self.domains = frozenset(new_domains)
+        self.loaded_bytes, self.loaded_mtime = end, stat.st_mtime
+        self.loaded_inode, self.loaded_fingerprint = stat.st_ino, fingerprint
+        self.load_seconds = time.perf_counter() - start
+        log.info("Loaded %d blocked domains (%d new) in %.0fms, ~%.1fMB.", len(self.domains), len(added), self.load_seconds * 1000, self.memory_bytes() / 1e6)
+        return len(added)
+
+    async def load_async(self):
+        # File parsing stays off the event loop, the set is swapped in with a single assignment
+        try:
+            return await asyncio.to_thread(self.load)
+        except Exception as e:
+            log.error("Error loading blocked domains from %s: %s", self.path, e)
+            return 0
+
+    def match(self, host):
+        # Checks the host and each parent domain, so listing evil.com also catches cdn.evil.com
+        domains = self.domains
+        labels = host.split(".")
+        for i in range(len(labels) - 1):
+            candidate = ".".join(labels[i:])
+            if candidate in domains:
+                return candidate
+        return None
+
+    def check(self, text):
+        if not self.domains:
+            return None
+        self.lookups += 1
+        for host in extract_hosts(text):
+            domain = self.match(host)
+            if domain:
+                self.hits += 1
+                return domain
+        return None
+
+    def memory_bytes(self):
+        return sys.getsizeof(self.domains) + sum(sys.getsizeof(d) for d in self.domains)
+
+    def stats(self):
+        return {
+            "domains": len(self.domains),
+            "memory_bytes": self.memory_bytes(),
+            "load_seconds": self.load_seconds,
+            "lookups": self.lookups,
+            "hits": self.hits,
+        }
+
+def _benchmark(domain_count=500000, messages=20000):
+    import random, string, tempfile
+
+    rand = random.Random(0)
+    def label():
+        return "".join(rand.choices(string.ascii_lowercase, k=rand.randint(4, 12)))
+
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+        for _ in range(domain_count):
+            f.write(f"{label()}.{rand.choice(['com', 'net', 'xyz', 'ru', 'gift'])}\n")
+        path = f.name
+
+    try:
+        blocklist = DomainBlocklist(path)
+        blocklist.load()
+        texts = [f"hey check https://{label()}.{label()}.com/path?x=1 and {label()} stuff" for _ in range(messages)]
+        start = time.perf_counter()
+        for text in texts:
+            blocklist.check(text)
+        elapsed = time.perf_counter() - start
+        print(f"{domain_count} domains: load {blocklist.load_seconds * 1000:.0f}ms, {blocklist.memory_bytes() / 1e6:.1f}MB")
+        print(f"  check: {elapsed / messages * 1e6:.2f}us/message with a URL")
+    finally:
+        os.unlink(path)
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,187 @@
+import datetime, logging, math, re, time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+_MASK = (1 << 64) - 1
+_BANDS = 4
+_BAND_BITS = 64 // _BANDS
+_NOISE_RE = re.compile(r"<[@#!&:a-z0-9_]*>|https?://\S+|[^\w\s]")
+_DIGITS_RE = re.compile(r"\d+")
+# What raids actually deliver; plain chat repeated by many people ("happy birthday!") has none of it
+_PAYLOAD_RE = re.compile(r"https?://|discord\.gg/|<@[!&]?\d+>|@everyone|@here", re.IGNORECASE)
+
+def normalize(text):
+    # Mentions, links and punctuation are what raiders vary first; digits are collapsed the same way
+    text = _NOISE_RE.sub(" ", text.casefold())
+    text = _DIGITS_RE.sub("0", text)
+    return " ".join(text.split())
+
+def simhash(text, shingle=4, max_features=96, max_chars=512):
+    # Character shingles survive single-letter edits far better than word features do
+    text = text[:max_chars]
+    features = {text[i:i + shingle] for i in range(max(1, len(text) - shingle + 1))}
+    bits = [format(hash(feature) & _MASK, "064b") for feature in list(features)[:max_features]]
+    # Column-wise majority vote over the feature hashes, done with C-level zip/count instead of a bit loop
+    half = len(bits) / 2
+    return int("".join("1" if column.count("1") > half else "0" for column in zip(*bits)), 2)
+
+def _bands(value):
+    return [(band, value >> (band * _BAND_BITS) & 0xFFFF) for band in range(_BANDS)]
+
+class _Entry:
+    __slots__ = ("timestamp", "exact", "fingerprint", "user_id", "message", "cleaned")
+
+    def __init__(self, timestamp, exact, fingerprint, user_id, message):
+        self.timestamp = timestamp
+        self.exact = exact
+        self.fingerprint = fingerprint
+        self.user_id = user_id
+        self.message = message
+        self.cleaned = False
+
+class _GuildWindow:
+    __slots__ = ("ring", "index")
+
+    def __init__(self, size):
+        self.ring = deque(maxlen=size)
+        self.index = {}
+
+    def add(self, entry):
+        if len(self.ring) == self.ring.maxlen:
+            self._unindex(self.ring[0])
+        self.ring.append(entry)
+        for key in _bands(entry.fingerprint) + [entry.exact]:
+            self.index.setdefault(key, []).append(entry)
+
+    def _unindex(self, entry):
+        for key in _bands(entry.fingerprint) + [entry.exact]:
+            bucket = self.index.get(key)
+            if bucket:
+                bucket.remove(entry)
+                if not bucket:
+                    del self.index[key]
+
+    def recent(self, now, window_seconds):
+        # The ring is in arrival order, so walk back from the newest entry until one falls outside the window
+        count = 0
+        for entry in reversed(self.ring):
+            if now - entry.timestamp > window_seconds:
+                break
+            count += 1
+        return count
+
+    def candidates(self, exact, fingerprint):
+        seen = set()
+        for key in [exact] + _bands(fingerprint):
+            for entry in self.index.get(key, ()):
+                if id(entry) not in seen:
+                    seen.add(id(entry))
+                    yield entry
+
+class FloodDetector:
+    # With 4 bands of 16 bits, any pair within 3 bits shares a band, so the index never misses one
+    def __init__(self, window_seconds=30, min_users=6, min_share=0.25, max_distance=3, ring_size=256, max_guilds=1000, min_length=16,
+                 new_account_age=datetime.timedelta(days=7), clock=time.monotonic):
+        self.window_seconds = window_seconds
+        self.min_users = min_users
+        # A busy guild needs a bigger cluster: it must also be this share of the guild's recent messages
+        self.min_share = min_share
+        self.new_account_age = new_account_age
+        self.max_distance = max_distance
+        self.ring_size = ring_size
+        self.max_guilds = max_guilds
+        self.min_length = min_length
+        self.clock = clock
+        self.guilds = {}
+        self.checked = 0
+        self.flagged = 0
+        self.flagged_only = 0
+
+    def _window(self, guild_id):
+        window = self.guilds.get(guild_id)
+        if window is None:
+            if len(self.guilds) >= self.max_guilds:
+                # dicts keep insertion order, so this drops the guild we started tracking first
+                del self.guilds[next(iter(self.guilds))]
+            window = self.guilds[guild_id] = _GuildWindow(self.ring_size)
+        return window
+
+    def _signal(self, cluster, raiding):
+        # Near-duplicates alone are not enough to delete; a raid needs one of these as well
+        if raiding:
+            return "join raid"
+        for entry in cluster:
+            message = entry.message
+            if _PAYLOAD_RE.search(message.content):
+                return "links or mentions"
+            created = getattr(message.author, "created_at", None)
+            if created is not None and message.created_at - created < self.new_account_age:
+                return "new accounts"
+        return None
+
+    def check(self, message, raiding=False):
+        # Returns the not-yet-cleaned messages of a near-duplicate burst, or [] when the message looks normal.
+        # Bursts with no raid signal are only logged, so repeated chat like "happy birthday" is left alone.
+        if message.guild is None or message.author.bot:
+            return []
+
+        normalized = normalize(message.content)
+        if len(normalized) < self.min_length:
+            return []
+
+        self.checked += 1
+        now = self.clock()
+        exact = hash(normalized)
+        fingerprint = simhash(normalized)
+        entry = _Entry(now, exact, fingerprint, message.author.id, message)
+        window = self._window(message.guild.id)
+
+        cluster = [entry]
+        users = {entry.user_id}
+        for other in window.candidates(exact, fingerprint):
+            if now - other.timestamp > self.window_seconds:
+                continue
+            if other.exact == exact or bin(other.fingerprint ^ fingerprint).count("1") <= self.max_distance:
+                cluster.append(other)
+                users.add(other.user_id)
+
+        window.add(entry)
+        if len(users) < self.min_users:
+            return []
+        if len(users) < math.ceil(window.recent(now, self.window_seconds) * self.min_share):
+            return []
+
+        if self._signal(cluster, raiding) is None:
+            self.flagged_only += 1
+            log.info("Near-duplicate messages from %d users in %s with no raid signal, not deleting.", len(users), message.guild)
+            return []
+
+        self.flagged += 1
+        burst = [e for e in cluster if not e.cleaned]
+        for e in burst:
+            e.cleaned = True
+        return [e.message for e in burst]
+
+    def stats(self):
+        return {
+            "checked": self.checked,
+            "flagged": self.flagged,
+            "flagged_only": self.flagged_only,
+            "tracked_guilds": len(self.guilds),
+        }
+
+async def cleanup(messages, wiped_messages):
+    # One bulk delete per channel instead of a REST call per message
+    by_channel = {}
+    for message in messages:
+        by_channel.setdefault(message.channel, []).append(message)
+
+    for channel, channel_messages in by_channel.items():
+        for message in channel_messages:
+            wiped_messages[message.id] = time.monotonic()
+        try:
+            for start in range(0, len(channel_messages), 100):
+                await channel.delete_messages(channel_messages[start:start + 100], reason="Near-duplicate message flood")
+        except Exception as e:
+            log.warning("Flood cleanup failed in %s: %s", channel, e)
@@ -0,0 +1,101 @@
+import asyncio, logging, time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+class _GuildJoins:
+    __slots__ = ("times", "pending", "flush_task", "raiding", "last_storm")
+
+    def __init__(self):
+        self.times = deque()
+        self.pending = []
+        self.flush_task = None
+        self.raiding = False
+        self.last_storm = 0.0
+
+class JoinAggregator:
+    # Below threshold joins per window every member is welcomed on their own, as before;
+    # above it they are queued and welcomed together once per batch_interval
+    def __init__(self, welcome, threshold=10, window_seconds=60, batch_interval=15, max_mentions=20, raid_cooldown=300, clock=time.monotonic):
+        self.welcome = welcome
+        self.threshold = threshold
+        self.window_seconds = window_seconds
+        self.batch_interval = batch_interval
+        self.max_mentions = max_mentions
+        self.raid_cooldown = raid_cooldown
+        self.clock = clock
+        self.guilds = {}
+        self.listeners = []
+
+    def subscribe(self, callback):
+        # callback(guild, raiding) is awaited when a guild enters or leaves raid mode
+        self.listeners.append(callback)
+
+    def is_raiding(self, guild_id):
+        joins = self.guilds.get(guild_id)
+        return joins is not None and joins.raiding
+
+    def join_rate(self, guild_id):
+        joins = self.guilds.get(guild_id)
+        if joins is None:
+            return 0
+        self._expire(joins, self.clock())
+        return len(joins.times)
+
+    def _expire(self, joins, now):
+        cutoff = now - self.window_seconds
+        while joins.times and joins.times[0] < cutoff:
+            joins.times.popleft()
+
+    async def _signal(self, guild, raiding):
+        for callback in self.listeners:
+            try:
+                await callback(guild, raiding)
+            except Exception:
+                log.exception("Raid listener failed for %s", guild.name)
+
+    async def member_joined(self, member):
+        guild = member.guild
+        joins = self.guilds.setdefault(guild.id, _GuildJoins())
+        now = self.clock()
+        joins.times.append(now)
+        self._expire(joins, now)
+
+        if len(joins.times) >= self.threshold:
+            joins.last_storm = now
+            if not joins.raiding:
+                joins.raiding = True
+                await self._signal(guild, True)
+
+        if not joins.raiding:
+            await self.welcome(guild, [member], 0)
+            return
+
+        joins.pending.append(member)
+        if joins.flush_task is None or joins.flush_task.done():
+            joins.flush_task = asyncio.create_task(self._flush_loop(guild, joins))
+
+    async def _flush_loop(self, guild, joins):
+        # One welcome per interval for everyone who joined since the last one; ends when the storm has passed
+        while True:
+            await asyncio.sleep(self.batch_interval)
+            if joins.pending:
+                members, joins.pending = joins.pending, []
+                shown = members[:self.max_mentions]
+                try:
+                    await self.welcome(guild, shown, len(members) - len(shown))
+                except Exception:
+                    log.exception("Batched welcome failed in %s", guild.name)
+                continue
+
+            now = self.clock()
+            self._expire(joins, now)
+            if len(joins.times) < self.threshold and now - joins.last_storm >= self.raid_cooldown:
+                joins.raiding = False
+                await self._signal(guild, False)
+                return
+
+    def shutdown(self):
+        for joins in self.guilds.values():
+            if joins.flush_task is not None:
+                joins.flush_task.cancel()
@@ -0,0 +1,130 @@
+from collections import OrderedDict
+
+_MISSING = object()
+
+class SegmentedLRU:
+    # New keys start on probation and only move to the protected segment when they are read again,
+    # so a wave of one-off lookups from inactive users cannot push out the regulars
+    def __init__(self, capacity=50000, protected_ratio=0.8):
+        self.protected_capacity = max(1, int(capacity * protected_ratio))
+        self.probation_capacity = max(1, capacity - self.protected_capacity)
+        self.probation = OrderedDict()
+        self.protected = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        if key in self.protected:
+            self.protected.move_to_end(key)
+            self.hits += 1
+            return self.protected[key]
+
+        value = self.probation.pop(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self._protect(key, value)
+        return value
+
+    def _protect(self, key, value):
+        self.protected[key] = value
+        if len(self.protected) > self.protected_capacity:
+            # Demoted rather than dropped, it gets one more chance on probation
+            old_key, old_value = self.protected.popitem(last=False)
+            self._admit(old_key, old_value)
+
+    def _admit(self, key, value):
+        self.probation[key] = value
+        self.probation.move_to_end(key)
+        if len(self.probation) > self.probation_capacity:
+            self.probation.popitem(last=False)
+            self.evictions += 1
+
+    def put(self, key, value):
+        if key in self.protected:
+            self.protected[key] = value
+            self.protected.move_to_end(key)
+        else:
+            self._admit(key, value)
+
+    def update(self, key, value):
+        # Write path: refresh a cached value in place without promoting it
+        if key in self.protected:
+            self.protected[key] = value
+        elif key in self.probation:
+            self.probation[key] = value
+        else:
+            self._admit(key, value)
+
+    def discard(self, key):
+        self.protected.pop(key, None)
+        self.probation.pop(key, None)
+
+    def clear(self):
+        self.protected.clear()
+        self.probation.clear()
+
+    def __len__(self):
+        return len(self.protected) + len(self.probation)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "protected": len(self.protected),
+            "probation": len(self.probation),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+class CachedStorage:
+    # Read-through cache of (xp, level) per (guild_id, user_id) in front of a storage backend
+    def __init__(self, storage, capacity=50000):
+        self.storage = storage
+        self.cache = SegmentedLRU(capacity)
+
+    def __getattr__(self, name):
+        # Everything we do not cache (open, close, top, ...) goes straight to the backend
+        return getattr(self.storage, name)
+
+    async def get_user(self, guild_id, user_id):
+        key = (guild_id, user_id)
+        cached = self.cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        row = await self.storage.get_user(guild_id, user_id)
+        row = tuple(row) if row is not None else None
+        # Unknown users are cached as None too, so repeat lookups for them skip the database
+        self.cache.put(key, row)
+        return row
+
+    async def set_user(self, guild_id, user_id, xp, level):
+        await self.storage.set_user(guild_id, user_id, xp, level)
+        self.cache.update((guild_id, user_id), (xp, level))
+
+    async def add_xp(self, guild_id, user_id, amount):
+        row = tuple(await self.storage.add_xp(guild_id, user_id, amount))
+        self.cache.update((guild_id, user_id), row)
+        return row
+
+    async def set_level(self, guild_id, user_id, expected, level):
+        row = await self.storage.set_level(guild_id, user_id, expected, level)
+        if row is not None:
+            row = tuple(row)
+            self.cache.update((guild_id, user_id), row)
+        return row
+
+    async def bulk_write(self, rows):
+        rows = list(rows)
+        await self.storage.bulk_write(rows)
+        # Bulk loads touch mostly cold users; drop what we had instead of filling the cache with them
+        for guild_id, user_id, _, _ in rows:
+            self.cache.discard((guild_id, user_id))
+
+    def stats(self):
+        return self.cache.stats()
@@ -1,41 +1,53 @@
-import random, aiosqlite
+import math, random, modules.tracing as tracing
 
-async def level(message, db, xp_cooldowns):
+def xp_for_next_level(level):
+    return 5 * (level**2) + (50 * level) + 100
+
+def level_for_xp(xp):
+    # The level a user would be at after earning xp in one go, for imports and repairs
+    if xp < xp_for_next_level(0):
+        return 0
+    # Closed-form root of 5L^2 + 50L + 100 = xp, nudged to the exact integer answer
+    level = max(0, (math.isqrt(20 * xp + 500) - 50) // 10 + 1)
+    while level > 0 and xp < xp_for_next_level(level - 1):
+        level -= 1
+    while xp >= xp_for_next_level(level):
+        level += 1
+    return level
+
+async def level(message, storage, xp_cooldowns, on_level_up=None):
     if message.author.bot or not message.guild:
         return
 
+    guild_id = message.guild.id
     user_id = message.author.id
+    cooldown_key = (guild_id, user_id)
 
     current_time = message.created_at.timestamp()
-    if user_id not in xp_cooldowns or (current_time - xp_cooldowns[user_id]) > 60:
-        async with aiosqlite.connect("levels.db") as db:
-            async with db.execute("SELECT xp, level FROM users WHERE user_id = ?", (user_id,)) as cursor:
-                result = await cursor.fetchone()
-                
-                if result is None:
-                    xp, level = 0, 0
-                    await db.execute("INSERT INTO users (user_id, xp, level) VALUES (?, ?, ?)", (user_id, xp, level))
-                else:
-                    xp, level = result
-
-            # Add XP and check for level up
-            xp += random.randint(15, 25)
-            next_lvl_xp = 5 * (level**2) + (50 * level) + 100
-
-            if xp >= next_lvl_xp:
-                level += 1
-                await message.channel.send(f"Congrats {message.author.mention}! You reached **Level {level}**!")
-
-            await db.execute("UPDATE users SET xp = ?, level = ? WHERE user_id = ?", (xp, level, user_id))
-            await db.commit()
-            xp_cooldowns[user_id] = current_time
-    
-async def get_user_level(user_id, db, configs):
-    async with aiosqlite.connect(db) as db:
-        async with db.execute("SELECT xp, level FROM users WHERE user_id = ?", (user_id,)) as cursor:
-            result = await cursor.fetchone()
-            if result is None:
-                return 0, 0
-            elif result:
-                xp, level = result
-                return level
\ No newline at end of file
+    if cooldown_key not in xp_cooldowns or (current_time - xp_cooldowns[cooldown_key]) > 60:
+        # Claim the cooldown before awaiting so a second message handled meanwhile doesn't earn XP too;
+        # the increment itself is atomic in storage
+        xp_cooldowns[cooldown_key] = current_time
+        with tracing.span("storage.add_xp"):
+            xp, level = await storage.add_xp(guild_id, user_id, random.randint(15, 25))
+
+        if xp < xp_for_next_level(level):
+            return
+        # Only the handler whose compare-and-set wins announces the level-up
+        with tracing.span("storage.set_level"):
+            promoted = await storage.set_level(guild_id, user_id, level, level + 1)
+        if promoted is None:
+            return
+        level += 1
+        await message.channel.send(f"Congrats {message.author.mention}! You reached **Level {level}**!")
+
+        if on_level_up is not None:
+            with tracing.span("rank_sync", level=level):
+                await on_level_up(message.author, level)
+
+async def get_user_level(guild_id, user_id, storage, configs):
+    # Always (xp, level); users who never earned XP are (0, 0)
+    result = await storage.get_user(guild_id, user_id)
+    if result is None:
+        return 0, 0
+    return result
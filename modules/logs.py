@@ -0,0 +1,62 @@
+import logging, logging.handlers, queue, random, sys
+from pathlib import Path
+
+LOG_PATH = "./logs/astromech.log"
+FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+_listener = None
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The stock QueueHandler formats the message before enqueueing; here that happens on the writer thread,
+    # so a log call from the event loop is a level check, a filter and a put_nowait
+    def prepare(self, record):
+        return record
+
+class SampleFilter(logging.Filter):
+    # Lets through a random fraction of DEBUG records so per-message lines stay affordable; higher levels always pass
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+def setup(level=logging.INFO, path=LOG_PATH, debug_sample_rate=0.01, max_bytes=5 * 1024 * 1024, backups=5, console=True):
+    # Installs one queue-backed handler on the root logger; a background thread does all the writing
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    if isinstance(level, str):
+        level = logging.getLevelName(level)
+
+    handlers = []
+    if path:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        handlers.append(logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"))
+    if console:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    formatter = logging.Formatter(FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SampleFilter(debug_sample_rate))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    # discord.py is chatty at DEBUG and already has sensible INFO output
+    logging.getLogger("discord").setLevel(max(level, logging.INFO))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def shutdown():
+    # Drains whatever is still queued; called last so shutdown messages make it to disk
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,52 @@
+import logging, time, modules.backup as backup
+
+log = logging.getLogger(__name__)
+
+# Cooldowns only matter for 60 seconds after the message that set them
+XP_COOLDOWN_SECONDS = 60
+
+# A wiped message whose delete event never arrived is not coming back after this long
+WIPED_MESSAGE_TTL = 3600
+
+def sweep_xp_cooldowns(xp_cooldowns, now=None):
+    cutoff = (now or time.time()) - XP_COOLDOWN_SECONDS
+    expired = [key for key, timestamp in xp_cooldowns.items() if timestamp < cutoff]
+    for key in expired:
+        del xp_cooldowns[key]
+    return len(expired)
+
+def sweep_wiped_messages(wiped_messages, now=None):
+    # wiped_messages maps id -> time.monotonic() when it was wiped; !wipe deletes months-old messages,
+    # so the snowflake's creation time says nothing about whether its delete event is still on the way
+    cutoff = (now or time.monotonic()) - WIPED_MESSAGE_TTL
+    expired = [message_id for message_id, wiped_at in wiped_messages.items() if wiped_at < cutoff]
+    for message_id in expired:
+        del wiped_messages[message_id]
+    return len(expired)
+
+def register(scheduler, client):
+    async def cooldowns():
+        sweep_xp_cooldowns(client.xp_cooldowns)
+
+    async def wiped():
+        sweep_wiped_messages(client.wiped_messages)
+
+    async def database():
+        await client.storage.optimize()
+
+    async def domains():
+        await client.domain_blocklist.load_async()
+
+    async def audit():
+        await client.audit.prune()
+
+    async def levels_backup():
+        client.last_backup = await backup.backup_async(client.db_path)
+        log.info(backup.describe(client.last_backup))
+
+    scheduler.every("sweep_xp_cooldowns", 120, cooldowns)
+    scheduler.every("sweep_wiped_messages", 600, wiped)
+    scheduler.every("sqlite_optimize", 3600, database)
+    scheduler.every("refresh_domain_blocklist", 600, domains)
+    scheduler.every("prune_audit_log", 86400, audit)
+    scheduler.every("backup_levels_db", 6 * 3600, levels_backup)
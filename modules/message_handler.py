@@ -1,25 +1,63 @@
-import re, modules.leveling as leveling
+import logging, time, modules.leveling as leveling, modules.flood as flood, modules.tracing as tracing
+
+log = logging.getLogger(__name__)
 
 def contains_blocked_pattern(text, configs):
-    try:
-        print("configs loads:", configs.keys())
-    except Exception as e:
-        print(f"Error loading configs: {e}")
-        configs = {"blockedFormats": {"blocked_patterns": {}}}
-    
-    for name, pattern in configs["blockedFormats"]["blocked_patterns"].items():
-        if re.search(pattern["regex"], text, re.IGNORECASE):
-            return True, name
-    return False, None
+    return configs.pattern_set.search(text)
+
+def contains_whitelisted_phrase(text, configs):
+    return configs.phrase_matcher.find(text)
 
 async def handle_message(message, configs, client=None):
-    blocked, pattern_name = contains_blocked_pattern(message.content, configs)
+    audit = getattr(client, "audit", None) if client is not None else None
+
+    # Raid copies are cleaned up in one batch and never reach the pattern scan or XP; the detector only
+    # returns a burst when a raid signal (join raid, links/mentions, new accounts) backs it up
+    if client is not None and getattr(client, "flood_detector", None) is not None:
+        joins = getattr(client, "join_aggregator", None)
+        raiding = joins is not None and message.guild is not None and joins.is_raiding(message.guild.id)
+        with tracing.span("flood"):
+            burst = client.flood_detector.check(message, raiding=raiding)
+        if burst:
+            log.info("Near-duplicate flood in %s: cleaning up %d messages.", message.guild, len(burst))
+            if audit is not None:
+                for flooded in burst:
+                    audit.record("flood_cleanup", message.guild.id, user_id=flooded.author.id, channel_id=flooded.channel.id,
+                                 message_id=flooded.id, content=flooded.content)
+            with tracing.span("flood_cleanup", messages=len(burst)):
+                await flood.cleanup(burst, client.wiped_messages)
+            return
+
+    # A whitelisted phrase only vouches against pattern false positives; flood and domain checks still apply
+    with tracing.span("whitelist"):
+        whitelisted = contains_whitelisted_phrase(message.content, configs)
+
+    blocked, pattern_name = False, None
+    if not whitelisted:
+        with tracing.span("scan", length=len(message.content)):
+            if client is not None and getattr(client, "scanner", None) is not None:
+                blocked, pattern_name = await client.scanner.scan(message.content, configs)
+            else:
+                blocked, pattern_name = contains_blocked_pattern(message.content, configs)
+
+    if not blocked and client is not None and getattr(client, "domain_blocklist", None) is not None:
+        with tracing.span("domains"):
+            domain = client.domain_blocklist.check(message.content)
+        if domain:
+            blocked, pattern_name = True, f"blocked domain ({domain})"
 
     if blocked:
-        print(f"Message by {message.author} matched blocked pattern: {pattern_name}. Deleting message.")
+        tracing.current().set(blocked=pattern_name)
+        log.info("Message by %s matched blocked pattern: %s. Deleting message.", message.author, pattern_name)
+        if audit is not None and message.guild is not None:
+            audit.record("blocked_message", message.guild.id, user_id=message.author.id, channel_id=message.channel.id,
+                         pattern=pattern_name, message_id=message.id, content=message.content)
+        # Otherwise the delete event would repost the blocked link through the webhook
+        if client is not None:
+            client.wiped_messages[message.id] = time.monotonic()
         await message.delete()
         await message.channel.send(
             f"{message.author.mention}, your message was removed for: {pattern_name}."
         )
     else:
-        await leveling.level(message, client.db_path, client.xp_cooldowns)
\ No newline at end of file
+        await leveling.level(message, client.storage, client.xp_cooldowns, client.rank_roles.sync_member)
\ No newline at end of file
@@ -0,0 +1,79 @@
+import asyncio, datetime, re, discord
+from discord.utils import get
+
+# discord.py already waits out 429s per route; this just keeps a raid response from queueing hundreds of requests at once
+MAX_CONCURRENT_ACTIONS = 5
+# A join window reaches back at most this far, and selecting more than CONFIRM_ABOVE members needs "confirm" in the command
+MAX_WINDOW = datetime.timedelta(hours=24)
+CONFIRM_ABOVE = 10
+
+_ID = re.compile(r"<@!?(\d{15,21})>|\b(\d{15,21})\b")
+_WINDOW = re.compile(r"\bjoined:(\d+)([smh]?)\b", re.IGNORECASE)
+_UNITS = {"s": 1, "m": 60, "h": 3600, "": 60}
+_CONFIRM = re.compile(r"\bconfirm\b", re.IGNORECASE)
+
+def parse_window(content):
+    # "joined:15m" -> timedelta(minutes=15); a bare number is minutes, anything past MAX_WINDOW is cut down to it
+    match = _WINDOW.search(content)
+    if not match:
+        return None
+    return min(datetime.timedelta(seconds=int(match.group(1)) * _UNITS[match.group(2).lower()]), MAX_WINDOW)
+
+def needs_confirmation(targets, content):
+    return len(targets) > CONFIRM_ABOVE and not _CONFIRM.search(content)
+
+def resolve_targets(guild, content, mentions, configs, exclude=()):
+    # Mentions, raw ids and a join window can be mixed in one command; a lone name is the old single-target form
+    targets = {member.id: member for member in mentions if isinstance(member, discord.Member)}
+
+    for mention_id, raw_id in _ID.findall(content):
+        member = guild.get_member(int(mention_id or raw_id))
+        if member is not None:
+            targets[member.id] = member
+
+    window = parse_window(content)
+    if window is not None:
+        since = discord.utils.utcnow() - window
+        for member in guild.members:
+            # A join window is a blunt selector, so it skips bots and staff who happened to join recently
+            if member.joined_at is not None and member.joined_at >= since and not member.bot and not configs.is_staff(member):
+                targets[member.id] = member
+
+    if not targets and window is None:
+        name = _CONFIRM.sub("", content).strip()
+        member = get(guild.members, name=name) or get(guild.members, display_name=name)
+        if member is not None:
+            targets[member.id] = member
+
+    # Never act on the bot itself or on whoever ran the command
+    return [member for member_id, member in targets.items() if member_id not in exclude and member != guild.me]
+
+async def apply(targets, action, max_concurrency=MAX_CONCURRENT_ACTIONS):
+    # Runs action(member) for every target at once, capped by a semaphore; returns (done, failed)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(member):
+        async with semaphore:
+            try:
+                await action(member)
+                return member, None
+            except discord.Forbidden:
+                return member, "missing permission"
+            except discord.HTTPException as e:
+                return member, e.text or str(e.status)
+
+    results = await asyncio.gather(*(run(member) for member in targets))
+    done = [member for member, error in results if error is None]
+    failed = [(member, error) for member, error in results if error is not None]
+    return done, failed
+
+def summarize(verb, done, failed, limit=10):
+    # One reply for the whole batch, listing names only while the list stays readable
+    lines = [f"{verb} {len(done)} of {len(done) + len(failed)} users."]
+    if done:
+        names = ", ".join(member.display_name for member in done[:limit])
+        lines.append(names + (f" and {len(done) - limit} more" if len(done) > limit else ""))
+    if failed:
+        lines.append("Failed: " + ", ".join(f"{member.display_name} ({error})" for member, error in failed[:limit]) +
+                     (f" and {len(failed) - limit} more" if len(failed) > limit else ""))
+    return "\n".join(lines)
@@ -0,0 +1,357 @@
+import re, time, itertools, logging, threading
+
+log = logging.getLogger(__name__)
+
+# Optional linear-time / interruptible regex engines, plain `re` is the last resort
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+try:
+    import regex
+except ImportError:
+    regex = None
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+DEFAULT_SETTINGS = {
+    "engine": "auto",
+    "time_budget_ms": 25,
+    "max_scan_length": 4000,
+    # Patterns the static check flags can backtrack for seconds under plain re, which has no timeout
+    "allow_unbounded_patterns": False,
+}
+
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+_UNBOUNDED = sre_parse.MAXREPEAT
+
+# Worth a warning but not worth dropping the pattern: with one side capped at {n} the work is n per position
+_BOUNDED_OVERLAP = "adjacent quantifiers over overlapping characters, one of them bounded so backtracking stays linear"
+
+class CompiledPattern:
+    __slots__ = ("name", "description", "source", "engine", "matcher", "warnings", "prefilter")
+
+    def __init__(self, name, description, source, engine, matcher, warnings, prefilter=None):
+        self.name = name
+        self.description = description
+        self.source = source
+        self.engine = engine
+        self.matcher = matcher
+        self.warnings = warnings
+        self.prefilter = prefilter
+
+def _contains_repeat(items, unbounded_only):
+    for op, av in items:
+        if op in _REPEATS:
+            if av[1] == _UNBOUNDED or (not unbounded_only and av[1] > 1):
+                return True
+            if _contains_repeat(av[2], unbounded_only):
+                return True
+        elif op == sre_parse.SUBPATTERN:
+            if _contains_repeat(av[-1], unbounded_only):
+                return True
+        elif op == sre_parse.BRANCH:
+            if any(_contains_repeat(branch, unbounded_only) for branch in av[1]):
+                return True
+    return False
+
+def _sequences(items):
+    yield items
+    for op, av in items:
+        if op in _REPEATS:
+            yield from _sequences(av[2])
+        elif op == sre_parse.SUBPATTERN:
+            yield from _sequences(av[-1])
+        elif op == sre_parse.BRANCH:
+            for branch in av[1]:
+                yield from _sequences(branch)
+
+_CATEGORIES = {
+    sre_parse.CATEGORY_DIGIT: lambda c: c.isdigit(),
+    sre_parse.CATEGORY_NOT_DIGIT: lambda c: not c.isdigit(),
+    sre_parse.CATEGORY_SPACE: lambda c: c.isspace(),
+    sre_parse.CATEGORY_NOT_SPACE: lambda c: not c.isspace(),
+    sre_parse.CATEGORY_WORD: lambda c: c.isalnum() or c == "_",
+    sre_parse.CATEGORY_NOT_WORD: lambda c: not (c.isalnum() or c == "_"),
+}
+_SAMPLE = [chr(i) for i in range(128)]
+
+def _char_set(items):
+    # ASCII characters a single-character repeat body can consume, None if it is not that simple
+    items = list(items)
+    if len(items) != 1:
+        return None
+    op, av = items[0]
+    if op == sre_parse.LITERAL:
+        return {chr(av)}
+    if op == sre_parse.ANY:
+        return set(_SAMPLE)
+    if op != sre_parse.IN:
+        return None
+
+    chars, negate = set(), False
+    for item_op, item_av in av:
+        if item_op == sre_parse.NEGATE:
+            negate = True
+        elif item_op == sre_parse.LITERAL:
+            chars.add(chr(item_av))
+        elif item_op == sre_parse.RANGE:
+            chars.update(chr(i) for i in range(item_av[0], min(item_av[1], 127) + 1))
+        elif item_op == sre_parse.CATEGORY and item_av in _CATEGORIES:
+            chars.update(c for c in _SAMPLE if _CATEGORIES[item_av](c))
+        else:
+            return None
+    return set(_SAMPLE) - chars if negate else chars
+
+def analyze_pattern(source):
+    # Static check for the shapes that make backtracking engines blow up on crafted input
+    try:
+        parsed = sre_parse.parse(source)
+    except re.error as e:
+        return [f"does not parse: {e}"]
+
+    warnings = []
+    for sequence in _sequences(list(parsed)):
+        previous = None
+        for op, av in sequence:
+            if op not in _REPEATS:
+                previous = None
+                continue
+
+            low, high, body = av
+            if (high == _UNBOUNDED and _contains_repeat(body, False)) or (high > 1 and _contains_repeat(body, True)):
+                warnings.append("a nested quantifier like (a+)+, exponential backtracking")
+
+            chars = _char_set(body)
+            if previous is not None and chars is not None and previous & chars:
+                if high == _UNBOUNDED and previous_high == _UNBOUNDED:
+                    warnings.append("adjacent quantifiers over overlapping characters, polynomial backtracking")
+                elif _UNBOUNDED in (high, previous_high):
+                    warnings.append(_BOUNDED_OVERLAP)
+            previous, previous_high = (chars, high) if high > 1 else (None, None)
+    return sorted(set(warnings))
+
+_DIGIT_RE = re.compile(r"\d")
+
+def _is_digit_class(items):
+    return bool(items) and all(
+        (op == sre_parse.CATEGORY and av == sre_parse.CATEGORY_DIGIT) or
+        (op == sre_parse.RANGE and 48 <= av[0] and av[1] <= 57) or
+        (op == sre_parse.LITERAL and 48 <= av <= 57)
+        for op, av in items
+    )
+
+def _score(requirement):
+    literals, digit = requirement
+    scores = [len(literal) for literal in literals] + ([0.5] if digit else [])
+    return min(scores) if scores else 0
+
+def _clauses(items):
+    # Every clause must hold for a match; a clause (literals, digit) needs one of the
+    # casefolded literals, or any digit when digit is True
+    run = []
+    clauses = []
+    for op, av in list(items) + [(None, None)]:
+        if op == sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        # Only ASCII literals become clauses; casefold() and re.IGNORECASE disagree outside ASCII (İ, K, ſ)
+        if run and "".join(run).isascii():
+            clauses.append((frozenset(["".join(run).casefold()]), False))
+        run = []
+
+        if op == sre_parse.SUBPATTERN:
+            clauses.extend(_clauses(av[-1]))
+        elif op in _REPEATS and av[0] >= 1:
+            clauses.extend(_clauses(av[2]))
+        elif op == sre_parse.IN and _is_digit_class(av):
+            clauses.append((frozenset(), True))
+        elif op == sre_parse.BRANCH:
+            branches = [_best_clause(_clauses(branch)) for branch in av[1]]
+            if all(branches):
+                clauses.append((
+                    frozenset(literal for literals, _ in branches for literal in literals),
+                    any(digit for _, digit in branches)
+                ))
+    return clauses
+
+def _best_clause(clauses):
+    return max(clauses, key=_score) if clauses else None
+
+def extract_prefilter(source, max_clauses=3):
+    try:
+        clauses = _clauses(sre_parse.parse(source))
+    except re.error:
+        return None
+    # A few of the most selective clauses are enough, deduplicated so repeats are not re-checked
+    clauses = sorted(set(clauses), key=_score, reverse=True)[:max_clauses]
+    return tuple(clauses) or None
+
+def _select_engine(requested):
+    if requested == "auto":
+        if re2 is not None:
+            return "re2"
+        if regex is not None:
+            return "regex"
+        return "re"
+    if requested == "re2" and re2 is None:
+        log.warning("Regex engine 're2' requested but google-re2 is not installed, falling back.")
+        return _select_engine("auto")
+    if requested == "regex" and regex is None:
+        log.warning("Regex engine 'regex' requested but the regex package is not installed, falling back.")
+        return _select_engine("auto")
+    return requested
+
+def _compile(source, engine):
+    if engine == "re2":
+        try:
+            return "re2", re2.compile(source if source.startswith("(?i)") else "(?i)" + source)
+        except Exception:
+            # re2 rejects backreferences and lookarounds, those patterns need a backtracking engine
+            engine = "regex" if regex is not None else "re"
+    if engine == "regex":
+        return "regex", regex.compile(source, regex.IGNORECASE)
+    return "re", re.compile(source, re.IGNORECASE)
+
+_versions = itertools.count(1)
+
+class PatternSet:
+    def __init__(self, patterns, settings):
+        self.patterns = patterns
+        # Bumped on every compile so anything keyed on verdicts can tell the pattern sets apart
+        self.version = next(_versions)
+        self.time_budget = settings["time_budget_ms"] / 1000
+        self.max_scan_length = settings["max_scan_length"]
+        self.over_budget = {}
+        # search() also runs on scan threads, so counters are tallied per call and folded in under the lock
+        self._lock = threading.Lock()
+        self.messages = 0
+        self.cleared_by_prefilter = 0
+        self.regex_runs = 0
+        self.regex_skipped = 0
+
+    def _report(self, pattern, elapsed, timed_out=False):
+        with self._lock:
+            self.over_budget[pattern.name] = self.over_budget.get(pattern.name, 0) + 1
+        state = "timed out" if timed_out else f"took {elapsed * 1000:.1f}ms"
+        log.warning("Blocked pattern '%s' (%s) %s, budget is %.0fms.", pattern.name, pattern.engine, state, self.time_budget * 1000)
+
+    def search(self, text):
+        if self.max_scan_length and len(text) > self.max_scan_length:
+            text = text[:self.max_scan_length]
+
+        folded = None
+        has_digit = None
+        runs = skipped = 0
+        result = (False, None)
+        # casefold() only agrees with re.IGNORECASE on ASCII, so anything else always goes to the regex
+        prefilter = text.isascii()
+        for pattern in self.patterns:
+            # Cheap literal check first; most chat never needs the regex engine at all
+            if prefilter and pattern.prefilter is not None:
+                if folded is None:
+                    folded = text.casefold()
+                passed = True
+                for literals, digit in pattern.prefilter:
+                    if any(literal in folded for literal in literals):
+                        continue
+                    if digit and has_digit is None:
+                        has_digit = _DIGIT_RE.search(text) is not None
+                    if not (digit and has_digit):
+                        passed = False
+                        break
+                if not passed:
+                    skipped += 1
+                    continue
+
+            runs += 1
+            start = time.perf_counter()
+            if pattern.engine == "regex":
+                try:
+                    # concurrent=True releases the GIL so offloaded scans really run in parallel
+                    hit = pattern.matcher.search(text, concurrent=True, timeout=self.time_budget)
+                except TimeoutError:
+                    # Treat a pattern that blew its budget as a miss rather than stall the bot
+                    self._report(pattern, time.perf_counter() - start, timed_out=True)
+                    continue
+            else:
+                hit = pattern.matcher.search(text)
+
+            elapsed = time.perf_counter() - start
+            if elapsed > self.time_budget:
+                self._report(pattern, elapsed)
+            if hit:
+                result = (True, pattern.name)
+                break
+
+        with self._lock:
+            self.messages += 1
+            self.regex_runs += runs
+            self.regex_skipped += skipped
+            if not runs:
+                self.cleared_by_prefilter += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            checks = self.regex_runs + self.regex_skipped
+            return {
+                "messages": self.messages,
+                "cleared_by_prefilter": self.cleared_by_prefilter,
+                "regex_runs": self.regex_runs,
+                "regex_skipped": self.regex_skipped,
+                "skip_ratio": self.regex_skipped / checks if checks else 0.0,
+                "over_budget": dict(self.over_budget),
+            }
+
+def compile_patterns(blocked_formats):
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(blocked_formats.get("settings", {}))
+    engine = _select_engine(settings["engine"])
+
+    compiled = []
+    for name, pattern in blocked_formats.get("blocked_patterns", {}).items():
+        source = pattern["regex"]
+        warnings = analyze_pattern(source)
+        try:
+            used_engine, matcher = _compile(source, engine)
+        except Exception as e:
+            log.error("Error compiling blocked pattern '%s': %s. Skipping it.", name, e)
+            continue
+
+        unsafe = [warning for warning in warnings if warning != _BOUNDED_OVERLAP]
+        if unsafe and used_engine == "re":
+            if not settings["allow_unbounded_patterns"]:
+                log.error("Blocked pattern '%s' has %s and only the re engine is available. Skipping it; install regex or google-re2 to enable it.", name, "; ".join(unsafe))
+                continue
+        if warnings and used_engine == "re":
+            for warning in warnings:
+                log.warning("Blocked pattern '%s' has %s; install google-re2 or regex to bound it.", name, warning)
+
+        prefilter = extract_prefilter(source)
+        if prefilter is None:
+            log.info("Blocked pattern '%s' has no required literal, it will run on every message.", name)
+
+        compiled.append(CompiledPattern(name, pattern.get("description", ""), source, used_engine, matcher, warnings, prefilter))
+
+    return PatternSet(compiled, settings)
+
+# id(config dict) -> (config dict, PatternSet); one entry per guild config, old ones age out
+_cache = {}
+_CACHE_LIMIT = 64
+
+def get_pattern_set(blocked_formats):
+    # Compiled once per loaded config dict, `!config.reload` hands us a new dict
+    cached = _cache.get(id(blocked_formats))
+    if cached is not None and cached[0] is blocked_formats:
+        return cached[1]
+
+    pattern_set = compile_patterns(blocked_formats)
+    _cache[id(blocked_formats)] = (blocked_formats, pattern_set)
+    if len(_cache) > _CACHE_LIMIT:
+        del _cache[next(iter(_cache))]
+    return pattern_set
@@ -0,0 +1,129 @@
+from collections import deque
+
+# pyahocorasick is a C automaton; without it we build the same thing in pure Python
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+class PhraseMatcher:
+    __slots__ = ("phrases", "_automaton", "_goto", "_fail", "_output")
+
+    def __init__(self, phrases):
+        self.phrases = sorted({p.casefold() for p in phrases if p and p.strip()})
+        self._automaton = None
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [None]
+
+        if ahocorasick is not None and self.phrases:
+            self._automaton = ahocorasick.Automaton()
+            for phrase in self.phrases:
+                self._automaton.add_word(phrase, phrase)
+            self._automaton.make_automaton()
+        else:
+            self._build()
+
+    def _build(self):
+        goto, fail, output = self._goto, self._fail, self._output
+        for phrase in self.phrases:
+            state = 0
+            for char in phrase:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    fail.append(0)
+                    output.append(None)
+                state = next_state
+            output[state] = phrase
+
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                # Carry the shortest suffix match forward so search never has to walk fail links for output
+                if output[next_state] is None:
+                    output[next_state] = output[fail[next_state]]
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def find(self, text):
+        # First whitelisted phrase found in text, or None; one pass over the text however many phrases there are
+        if not self.phrases or not text:
+            return None
+
+        text = text.casefold()
+        if self._automaton is not None:
+            for _, phrase in self._automaton.iter(text):
+                return phrase
+            return None
+
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] is not None:
+                return output[state]
+        return None
+
+    def contains(self, text):
+        return self.find(text) is not None
+
+# id(config dict) -> (config dict, PhraseMatcher); one entry per guild config, old ones age out
+_cache = {}
+_CACHE_LIMIT = 64
+_EMPTY = PhraseMatcher([])
+
+def get_phrase_matcher(phrase_config):
+    # Built once per loaded config dict, `!config.reload` hands us a new dict
+    if not phrase_config:
+        return _EMPTY
+    cached = _cache.get(id(phrase_config))
+    if cached is not None and cached[0] is phrase_config:
+        return cached[1]
+
+    matcher = PhraseMatcher(phrase_config.get("phrases", []))
+    _cache[id(phrase_config)] = (phrase_config, matcher)
+    if len(_cache) > _CACHE_LIMIT:
+        del _cache[next(iter(_cache))]
+    return matcher
+
+def _benchmark(phrase_count=10000, messages=2000):
+    import random, string, time
+
+    rand = random.Random(0)
+    words = ["".join(rand.choices(string.ascii_lowercase, k=rand.randint(3, 9))) for _ in range(5000)]
+    phrases = [" ".join(rand.sample(words, 2)) for _ in range(phrase_count)]
+    texts = [" ".join(rand.choices(words, k=rand.randint(5, 40))) for _ in range(messages)]
+
+    start = time.perf_counter()
+    matcher = PhraseMatcher(phrases)
+    build = time.perf_counter() - start
+
+    folded = [p.casefold() for p in phrases]
+    start = time.perf_counter()
+    naive_hits = sum(any(p in t.casefold() for p in folded) for t in texts)
+    naive = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hits = sum(matcher.contains(t) for t in texts)
+    automaton = time.perf_counter() - start
+
+    engine = "pyahocorasick" if matcher._automaton is not None else "pure python"
+    print(f"{phrase_count} phrases, {messages} messages, {engine} automaton")
+    print(f"  build:     {build * 1000:.1f}ms")
+    print(f"  naive:     {naive / messages * 1e6:.1f}us/message ({naive_hits} hits)")
+    print(f"  automaton: {automaton / messages * 1e6:.1f}us/message ({hits} hits)")
+
+if __name__ == "__main__":
+    _benchmark()
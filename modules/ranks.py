@@ -0,0 +1,87 @@
+import asyncio, discord, logging
+
+log = logging.getLogger(__name__)
+
+RANKS = ["Ensign", "Lieutenant", "Lieutenant Commander", "Commander", "Captain", "Vice Admiral", "Admiral", "Fleet Admiral"]
+
+def rank_for_level(level):
+    # Level 0 and 1 are both Ensign, anything past the last rank stays Fleet Admiral
+    return RANKS[min(max(level, 1), len(RANKS)) - 1]
+
+class RankRoles:
+    def __init__(self, edits_per_second=1.0):
+        self.edits_per_second = edits_per_second
+        # guild_id -> {rank name: role id}; rebuilt whenever the guild's roles change
+        self.guild_roles = {}
+        self.resyncing = set()
+
+    def invalidate(self, guild_id):
+        self.guild_roles.pop(guild_id, None)
+
+    def role_ids(self, guild):
+        role_ids = self.guild_roles.get(guild.id)
+        if role_ids is None:
+            by_name = {role.name.lower(): role.id for role in guild.roles}
+            role_ids = {rank: by_name[rank.lower()] for rank in RANKS if rank.lower() in by_name}
+            self.guild_roles[guild.id] = role_ids
+        return role_ids
+
+    def role_for_level(self, guild, level):
+        role_id = self.role_ids(guild).get(rank_for_level(level))
+        return guild.get_role(role_id) if role_id is not None else None
+
+    def _desired_roles(self, member, level):
+        # Returns the member's full role list with exactly one rank role, or None if nothing changes
+        role_ids = self.role_ids(member.guild)
+        if not role_ids:
+            return None
+        rank_ids = set(role_ids.values())
+        target_id = role_ids.get(rank_for_level(level))
+
+        current = {role.id for role in member.roles if role.id in rank_ids}
+        wanted = {target_id} if target_id is not None else set()
+        if current == wanted:
+            return None
+
+        roles = [role for role in member.roles if role.id not in rank_ids and not role.is_default()]
+        if target_id is not None:
+            roles.append(member.guild.get_role(target_id))
+        return [role for role in roles if role is not None]
+
+    async def sync_member(self, member, level):
+        # One member.edit call swaps the old rank role for the new one
+        roles = self._desired_roles(member, level)
+        if roles is None:
+            return False
+        try:
+            await member.edit(roles=roles, reason=f"Rank sync: level {level}")
+            return True
+        except discord.Forbidden:
+            log.warning("Missing permission to update rank roles for %s in %s.", member, member.guild.name)
+        except discord.HTTPException as e:
+            log.warning("Rank role update failed for %s: %s", member, e)
+        return False
+
+    async def resync_guild(self, guild, storage):
+        # Only members whose rank role is wrong get an edit, spaced out so big guilds don't flood the API
+        if guild.id in self.resyncing:
+            return None
+        self.resyncing.add(guild.id)
+        try:
+            self.invalidate(guild.id)
+            if not guild.chunked:
+                await guild.chunk()
+            levels = await storage.guild_levels(guild.id)
+            changed = checked = 0
+            for member in guild.members:
+                # Members who never earned XP keep whatever roles they have rather than all becoming Ensign
+                level = levels.get(member.id, 0)
+                if member.bot or level == 0:
+                    continue
+                checked += 1
+                if await self.sync_member(member, level):
+                    changed += 1
+                    await asyncio.sleep(1 / self.edits_per_second)
+            return checked, changed
+        finally:
+            self.resyncing.discard(guild.id)
@@ -0,0 +1,103 @@
+import time
+from collections import OrderedDict
+
+# Tokens spent per invocation; commands missing here are not throttled
+COMMAND_COSTS = {
+    "!boom": 5,
+    "!wipe": 5,
+    "..bypass": 2,
+    "!checkrank": 1,
+    "!terminate": 1,
+    "!mute": 1,
+    "!config.reload": 2,
+    "!debug.info": 1,
+}
+
+# scope: (capacity, tokens refilled per second)
+BUCKET_LIMITS = {
+    "user": (10, 10 / 60),
+    "channel": (20, 20 / 60),
+    "guild": (60, 60 / 60),
+}
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated", "notified")
+
+    def __init__(self, capacity, now):
+        self.tokens = capacity
+        self.updated = now
+        self.notified = False
+
+    def refill(self, capacity, rate, now):
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+class RateLimiter:
+    def __init__(self, costs=COMMAND_COSTS, limits=BUCKET_LIMITS, max_keys=10000, clock=time.monotonic):
+        self.costs = costs
+        self.limits = limits
+        self.max_keys = max_keys
+        self.clock = clock
+        self.buckets = {scope: OrderedDict() for scope in limits}
+        self.allowed = 0
+        self.rejected = 0
+
+    def match_command(self, content):
+        for command in self.costs:
+            if content.startswith(command):
+                return command
+        return None
+
+    def _bucket(self, scope, key, now):
+        buckets = self.buckets[scope]
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.limits[scope][0], now)
+            buckets[key] = bucket
+            # Least recently used keys go first; an evicted bucket just comes back full
+            if len(buckets) > self.max_keys:
+                buckets.popitem(last=False)
+        else:
+            buckets.move_to_end(key)
+            bucket.refill(*self.limits[scope], now)
+        return bucket
+
+    def check(self, command, user_id, channel_id, guild_id):
+        # Returns (allowed, retry_after, notify); notify is only True on the first rejection of a streak
+        cost = self.costs.get(command)
+        if cost is None:
+            return True, 0.0, False
+
+        now = self.clock()
+        keys = {"user": user_id, "channel": channel_id, "guild": guild_id}
+        buckets = [(scope, self._bucket(scope, keys[scope], now)) for scope in self.limits if keys.get(scope) is not None]
+
+        retry_after = 0.0
+        for scope, bucket in buckets:
+            capacity, rate = self.limits[scope]
+            if bucket.tokens < cost:
+                if cost > capacity:
+                    retry_after = float("inf")
+                else:
+                    retry_after = max(retry_after, (cost - bucket.tokens) / rate)
+
+        if retry_after:
+            self.rejected += 1
+            # Tie the reply-once flag to the user's bucket so one spammer gets one warning
+            user_bucket = next((b for s, b in buckets if s == "user"), buckets[0][1])
+            notify = not user_bucket.notified
+            user_bucket.notified = True
+            return False, retry_after, notify
+
+        for _, bucket in buckets:
+            bucket.tokens -= cost
+            bucket.notified = False
+        self.allowed += 1
+        return True, 0.0, False
+
+    def stats(self):
+        return {
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "tracked_keys": {scope: len(buckets) for scope, buckets in self.buckets.items()},
+        }
@@ -0,0 +1,58 @@
+import importlib, logging, sys, time
+
+log = logging.getLogger(__name__)
+
+# Modules that only hold functions and constants, so reloading them cannot strand state held by live objects.
+# Listed in dependency order: a module is reloaded after the ones it imports.
+RELOADABLE = ("modules.leveling", "modules.moderation", "modules.message_handler")
+
+class ReloadError(Exception):
+    pass
+
+def _check_source(module):
+    # Compiling first catches syntax errors before anything is touched
+    path = getattr(module.__spec__, "origin", None)
+    if not path or not path.endswith(".py"):
+        raise ReloadError(f"{module.__name__} has no source file to reload from")
+    with open(path, "rb") as source:
+        compile(source.read(), path, "exec")
+
+def reload_modules(names=RELOADABLE):
+    # All or nothing: if any module fails to import, every module is put back exactly as it was.
+    # Nothing awaits in here, so no event handler ever sees a half-reloaded set.
+    if getattr(sys, "frozen", False):
+        raise ReloadError("hot reload is not available in frozen builds")
+    unknown = [name for name in names if name not in RELOADABLE]
+    if unknown:
+        raise ReloadError(f"not reloadable: {', '.join(unknown)}")
+
+    ordered = [name for name in RELOADABLE if name in names]
+    modules = [sys.modules[name] for name in ordered if name in sys.modules]
+    try:
+        for module in modules:
+            # Lazily imported modules run their code on first attribute access; do that here,
+            # where a failure is reported as a ReloadError instead of escaping the command
+            module.__dict__
+            _check_source(module)
+    except ReloadError:
+        raise
+    except Exception as e:
+        raise ReloadError(f"{type(e).__name__}: {e}") from e
+
+    snapshots = [(module, dict(module.__dict__)) for module in modules]
+    start = time.perf_counter()
+    reloaded = []
+    try:
+        for module in modules:
+            importlib.reload(module)
+            reloaded.append(module.__name__)
+    except Exception as e:
+        for module, snapshot in snapshots:
+            module.__dict__.clear()
+            module.__dict__.update(snapshot)
+        log.exception("Reload failed, restored %s", ", ".join(ordered))
+        raise ReloadError(f"{type(e).__name__} while reloading: {e}") from e
+
+    elapsed = time.perf_counter() - start
+    log.info("Reloaded %s in %.0fms", ", ".join(reloaded), elapsed * 1000)
+    return reloaded, elapsed
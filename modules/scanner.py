@@ -0,0 +1,126 @@
+import asyncio, time
+from collections import OrderedDict
+import modules.patterns as patterns, modules.verdicts as verdicts
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+DEFAULT_SETTINGS = {
+    "worker_mode": "auto",
+    "workers": 2,
+    "offload_length": 1000,
+    "offload_pattern_count": 50,
+}
+
+# Pattern sets compiled inside each pool process, keyed by the version the bot assigned them.
+# The config travels with every task, so one pool serves every guild and a reload never restarts it.
+_worker_patterns = OrderedDict()
+_WORKER_PATTERN_SETS = 16
+
+def _worker_search(version, blocked_formats, text):
+    pattern_set = _worker_patterns.get(version)
+    if pattern_set is None:
+        pattern_set = _worker_patterns[version] = patterns.compile_patterns(blocked_formats)
+        if len(_worker_patterns) > _WORKER_PATTERN_SETS:
+            _worker_patterns.popitem(last=False)
+    else:
+        _worker_patterns.move_to_end(version)
+    return pattern_set.search(text)
+
+def _worker_mode(settings, pattern_set):
+    # Plain `re` holds the GIL for the whole search, so a thread would still stall the event loop.
+    # Threads only help when every pattern runs on re2 or on regex with concurrent=True.
+    if any(pattern.engine == "re" for pattern in pattern_set.patterns):
+        return "process"
+    return "thread" if settings["worker_mode"] == "auto" else settings["worker_mode"]
+
+def _timed(search, text):
+    start = time.perf_counter()
+    return search(text), time.perf_counter() - start
+
+class ScanService:
+    def __init__(self, cache_size=50000):
+        self.verdicts = verdicts.VerdictCache(cache_size)
+        self.threads = None
+        self.processes = None
+        self.pending = 0
+        self.max_pending = 0
+        self.inline_scans = 0
+        self.offloaded_scans = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def _settings(self, blocked_formats):
+        settings = dict(DEFAULT_SETTINGS)
+        settings.update(blocked_formats.get("settings", {}))
+        return settings
+
+    def _get_executor(self, mode, settings):
+        # Both pools live for the life of the bot; nothing shared between guilds is ever torn down mid-scan
+        if mode == "process":
+            if self.processes is None:
+                self.processes = ProcessPoolExecutor(max_workers=settings["workers"])
+            return self.processes
+        if self.threads is None:
+            self.threads = ThreadPoolExecutor(max_workers=settings["workers"], thread_name_prefix="scan")
+        return self.threads
+
+    def _record(self, latency):
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    async def scan(self, text, config):
+        blocked_formats = config.blocked_formats
+        pattern_set = config.pattern_set
+
+        # Spam waves repeat the same text; a reload compiles a new pattern set version, so old verdicts no longer match
+        verdict = self.verdicts.get(text, pattern_set.version)
+        if verdict is not None:
+            return verdict
+
+        verdict = await self._scan(text, blocked_formats, pattern_set)
+        self.verdicts.put(text, pattern_set.version, verdict)
+        return verdict
+
+    async def _scan(self, text, blocked_formats, pattern_set):
+        settings = self._settings(blocked_formats)
+
+        if len(text) < settings["offload_length"] and len(pattern_set.patterns) < settings["offload_pattern_count"]:
+            self.inline_scans += 1
+            result, latency = _timed(pattern_set.search, text)
+            self._record(latency)
+            return result
+
+        mode = _worker_mode(settings, pattern_set)
+        executor = self._get_executor(mode, settings)
+        if mode == "process":
+            call = (_worker_search, pattern_set.version, blocked_formats, text)
+        else:
+            call = (pattern_set.search, text)
+
+        self.offloaded_scans += 1
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, *call)
+        finally:
+            self.pending -= 1
+            # Includes time spent queued behind other scans, which is what the caller actually waits
+            self._record(time.perf_counter() - start)
+
+    def stats(self):
+        scans = self.inline_scans + self.offloaded_scans
+        return {
+            "inline_scans": self.inline_scans,
+            "offloaded_scans": self.offloaded_scans,
+            "queue_depth": self.pending,
+            "max_queue_depth": self.max_pending,
+            "avg_latency_ms": (self.total_latency / scans * 1000) if scans else 0.0,
+            "max_latency_ms": self.max_latency * 1000,
+            "verdict_cache": self.verdicts.stats(),
+        }
+
+    def shutdown(self):
+        for executor in (self.threads, self.processes):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self.threads = self.processes = None
@@ -0,0 +1,124 @@
+import asyncio, logging, random, time
+
+log = logging.getLogger(__name__)
+
+class Job:
+    __slots__ = ("name", "func", "interval", "jitter", "initial_delay", "one_shot", "task",
+                 "running", "runs", "failures", "skipped", "last_duration", "total_duration",
+                 "max_duration", "last_error", "last_run")
+
+    def __init__(self, name, func, interval, jitter, initial_delay, one_shot):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.initial_delay = initial_delay
+        self.one_shot = one_shot
+        self.task = None
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_duration = 0.0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+        self.last_error = None
+        self.last_run = None
+
+    def stats(self):
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_duration_ms": self.last_duration * 1000,
+            "avg_duration_ms": (self.total_duration / self.runs * 1000) if self.runs else 0.0,
+            "max_duration_ms": self.max_duration * 1000,
+            "last_error": self.last_error,
+        }
+
+class Scheduler:
+    def __init__(self):
+        self.jobs = {}
+        self.started = False
+
+    def every(self, name, interval, func, jitter=0.1, initial_delay=None):
+        # func is an async callable; jitter is a fraction of the interval so jobs across restarts spread out
+        return self._add(Job(name, func, interval, jitter, interval if initial_delay is None else initial_delay, False))
+
+    def once(self, name, delay, func):
+        return self._add(Job(name, func, delay, 0, delay, True))
+
+    def _add(self, job):
+        old = self.jobs.get(job.name)
+        if old is not None and old.task is not None:
+            old.task.cancel()
+        self.jobs[job.name] = job
+        if self.started:
+            job.task = asyncio.create_task(self._loop(job), name=f"job:{job.name}")
+        return job
+
+    def start(self):
+        # Called from on_ready, which can fire again after reconnects; running jobs are left alone
+        self.started = True
+        for job in self.jobs.values():
+            if job.task is None or job.task.done():
+                job.task = asyncio.create_task(self._loop(job), name=f"job:{job.name}")
+
+    async def run_now(self, name):
+        return await self._run(self.jobs[name])
+
+    async def _run(self, job):
+        # A slow run never overlaps with the next tick of the same job
+        if job.running:
+            job.skipped += 1
+            return False
+        job.running = True
+        start = time.perf_counter()
+        try:
+            await job.func()
+            job.last_error = None
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            job.last_error = repr(e)
+            log.exception("Scheduled job '%s' failed", job.name)
+            return False
+        finally:
+            elapsed = time.perf_counter() - start
+            job.running = False
+            job.runs += 1
+            job.last_run = time.time()
+            job.last_duration = elapsed
+            job.total_duration += elapsed
+            job.max_duration = max(job.max_duration, elapsed)
+
+    def _delay(self, base, job):
+        return max(0.0, base + random.uniform(-job.jitter, job.jitter) * base)
+
+    async def _loop(self, job):
+        await asyncio.sleep(self._delay(job.initial_delay, job))
+        while True:
+            await self._run(job)
+            if job.one_shot:
+                self.jobs.pop(job.name, None)
+                return
+            await asyncio.sleep(self._delay(job.interval, job))
+
+    def cancel(self, name):
+        job = self.jobs.pop(name, None)
+        if job is not None and job.task is not None:
+            job.task.cancel()
+
+    async def shutdown(self, timeout=5):
+        # Cancels everything and waits briefly so in-flight jobs get to run their cleanup
+        self.started = False
+        tasks = [job.task for job in self.jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    def stats(self):
+        return {name: job.stats() for name, job in self.jobs.items()}
@@ -0,0 +1,114 @@
+import ast, importlib.util, logging, re, subprocess, sys, time
+
+log = logging.getLogger(__name__)
+
+READY_MARKER = "Startup complete"
+
+class StartupProfiler:
+    # Wall-clock phases from the first line of main.py to on_ready, reported once per process
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.last = self.started
+        self.phases = []
+        self.finished = False
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def total(self):
+        return self.last - self.started
+
+    def report(self):
+        phases = ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in self.phases)
+        return f"{READY_MARKER} in {self.total() * 1000:.0f}ms ({phases})"
+
+    def finish(self, phase="ready"):
+        # on_ready fires again after every reconnect; only the first one is startup
+        if self.finished:
+            return
+        self.mark(phase)
+        self.finished = True
+        log.info(self.report())
+
+def lazy_import(name):
+    # The module object exists right away but its code only runs on first attribute access.
+    # Frozen builds cannot see these imports, so they are listed in the spec files' hiddenimports.
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+def main_imports(path="main.py"):
+    # Every module main.py imports at the top level, in order, without running it
+    tree = ast.parse(open(path, encoding="utf-8").read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+def import_report(path="main.py", top=15):
+    # Runs the imports in a fresh interpreter under -X importtime and returns the slowest by cumulative time
+    code = "import " + ", ".join(main_imports(path))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+    timings = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if match:
+            timings.append((int(match.group(2)), len(match.group(3)) // 2, match.group(4)))
+    total = sum(cumulative for cumulative, depth, _ in timings if depth == 0)
+    return total, sorted(timings, reverse=True)[:top]
+
+def measure(command, runs=3, timeout=120):
+    # Launches the bot (or a built exe) and times how long until it logs the ready marker, then stops it
+    results = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8", errors="replace")
+        try:
+            for line in process.stdout:
+                if READY_MARKER in line:
+                    results.append(time.perf_counter() - start)
+                    break
+                if time.perf_counter() - start > timeout:
+                    break
+        finally:
+            process.kill()
+            process.wait()
+    return results
+
+def _main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m modules.startup", description="Import-time and time-to-ready reports.")
+    sub = parser.add_subparsers(dest="action", required=True)
+    imports = sub.add_parser("imports", help="slowest imports pulled in by main.py")
+    imports.add_argument("--top", type=int, default=15)
+    ready = sub.add_parser("measure", help="time-to-ready of one or more launch commands, e.g. dist/AstromechBot.exe")
+    ready.add_argument("commands", nargs="+", help="each command is one quoted string")
+    ready.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.action == "imports":
+        total, slowest = import_report(top=args.top)
+        print(f"main.py imports: {total / 1000:.0f}ms")
+        for cumulative, depth, name in slowest:
+            print(f"  {cumulative / 1000:8.1f}ms  {'  ' * depth}{name}")
+    else:
+        for command in args.commands:
+            results = measure(command.split(), args.runs)
+            if results:
+                print(f"{command}: best {min(results):.2f}s, median {sorted(results)[len(results) // 2]:.2f}s over {len(results)} runs")
+            else:
+                print(f"{command}: never logged '{READY_MARKER}'")
+
+if __name__ == "__main__":
+    _main()
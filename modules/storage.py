@@ -0,0 +1,322 @@
+import abc, asyncio, logging, os, aiosqlite
+
+log = logging.getLogger(__name__)
+
+# Rows copied per transaction when migrating, small enough that other writers never wait long
+MIGRATION_BATCH_SIZE = 5000
+
+# Legacy rows from before XP was per guild; the first guild the user earns XP in adopts them
+LEGACY_GUILD_ID = 0
+
+async def _table_exists(db, name):
+    async with db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)) as cursor:
+        return await cursor.fetchone() is not None
+
+async def _has_column(db, table, column):
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        return any(row[1] == column for row in await cursor.fetchall())
+
+async def _migration_1(db, legacy_path):
+    # The original single-guild table, so fresh databases go through the same path as old ones
+    await db.execute("CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY, xp INTEGER, level INTEGER)")
+    await db.commit()
+
+    # Older builds wrote XP to levels.db in the working directory instead of db_path; pull it in once
+    if legacy_path and os.path.exists(legacy_path):
+        await db.execute("ATTACH DATABASE ? AS legacy", (legacy_path,))
+        try:
+            async with db.execute("SELECT 1 FROM legacy.sqlite_master WHERE type = 'table' AND name = 'users'") as cursor:
+                has_users = await cursor.fetchone() is not None
+            if has_users:
+                await db.execute("INSERT OR IGNORE INTO users (user_id, xp, level) SELECT user_id, xp, level FROM legacy.users")
+                await db.commit()
+                log.info("Imported XP rows from %s.", legacy_path)
+        finally:
+            await db.execute("DETACH DATABASE legacy")
+
+async def _migration_2(db, legacy_path):
+    # users becomes (guild_id, user_id) keyed WITHOUT ROWID; old rows are copied over in batches.
+    # Every step is safe to re-run, so an interrupted migration resumes where it stopped.
+    renamed = await _table_exists(db, "users_v1")
+    if not renamed and await _has_column(db, "users", "guild_id"):
+        # Already migrated, only the version bump was lost; renaming again would fold every guild into one
+        return
+
+    # Rename, create and index in one transaction; each DDL statement would otherwise commit on its own.
+    # CREATE ... IF NOT EXISTS also repairs databases left with users_v1 and no users table by older builds.
+    await db.execute("BEGIN")
+    try:
+        if not renamed:
+            await db.execute("ALTER TABLE users RENAME TO users_v1")
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                xp INTEGER NOT NULL DEFAULT 0,
+                level INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (guild_id, user_id)
+            ) WITHOUT ROWID
+        """)
+        await db.execute("CREATE INDEX IF NOT EXISTS users_guild_rank ON users (guild_id, xp DESC)")
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+
+    async with db.execute("SELECT COALESCE(MAX(user_id), -1) FROM users WHERE guild_id = ?", (LEGACY_GUILD_ID,)) as cursor:
+        (last_user_id,) = await cursor.fetchone()
+
+    copied = 0
+    while True:
+        async with db.execute(
+            "SELECT user_id, COALESCE(xp, 0), COALESCE(level, 0) FROM users_v1 WHERE user_id > ? ORDER BY user_id LIMIT ?",
+            (last_user_id, MIGRATION_BATCH_SIZE)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        if not rows:
+            break
+
+        await db.executemany(
+            "INSERT OR IGNORE INTO users (guild_id, user_id, xp, level) VALUES (?, ?, ?, ?)",
+            [(LEGACY_GUILD_ID, user_id, xp, level) for user_id, xp, level in rows]
+        )
+        await db.commit()
+        copied += len(rows)
+        last_user_id = rows[-1][0]
+        # Let the event loop run between batches
+        await asyncio.sleep(0)
+
+    # DDL does not open a transaction on its own here, so start one explicitly; migrate() commits the drop
+    # together with the user_version bump
+    await db.execute("BEGIN")
+    await db.execute("DROP TABLE users_v1")
+    if copied:
+        log.info("Migrated %d legacy XP rows into the per-guild users table.", copied)
+
+MIGRATIONS = [
+    _migration_1,
+    _migration_2,
+]
+
+async def migrate(db, legacy_path=None):
+    async with db.execute("PRAGMA user_version") as cursor:
+        (version,) = await cursor.fetchone()
+
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        log.info("Migrating levels database to schema version %d...", target)
+        await migration(db, legacy_path)
+        # PRAGMA does not take parameters; target is always one of our own integers.
+        # Committed with whatever the migration left open, so its last step and the version land together.
+        await db.execute(f"PRAGMA user_version = {target}")
+        await db.commit()
+    return len(MIGRATIONS)
+
+class StorageBackend(abc.ABC):
+    # What leveling needs from storage; rows are (xp, level) and bulk rows (guild_id, user_id, xp, level)
+
+    async def open(self):
+        return self
+
+    async def close(self):
+        pass
+
+    @abc.abstractmethod
+    async def get_user(self, guild_id, user_id):
+        ...
+
+    @abc.abstractmethod
+    async def set_user(self, guild_id, user_id, xp, level):
+        ...
+
+    @abc.abstractmethod
+    async def add_xp(self, guild_id, user_id, amount):
+        # Atomic increment, creating the row at level 0 if needed; returns the new (xp, level)
+        ...
+
+    @abc.abstractmethod
+    async def set_level(self, guild_id, user_id, expected, level):
+        # Compare-and-set on level alone; returns the new (xp, level), or None if the level was no longer expected
+        ...
+
+    @abc.abstractmethod
+    async def bulk_write(self, rows):
+        # Upserts many (guild_id, user_id, xp, level) rows in one go
+        ...
+
+    @abc.abstractmethod
+    async def top(self, guild_id, limit=10, offset=0):
+        ...
+
+    @abc.abstractmethod
+    async def rank_of(self, guild_id, user_id):
+        ...
+
+    @abc.abstractmethod
+    async def guild_levels(self, guild_id):
+        # {user_id: level} for a whole guild, for bulk jobs like rank-role resyncs
+        ...
+
+class SQLiteStorage(StorageBackend):
+    def __init__(self, path, legacy_path="levels.db"):
+        self.path = path
+        same_file = legacy_path and os.path.exists(legacy_path) and os.path.exists(path) and os.path.samefile(legacy_path, path)
+        self.legacy_path = None if same_file else legacy_path
+        self.db = None
+        self._lock = asyncio.Lock()
+
+    async def open(self):
+        # One long-lived connection instead of reconnecting for every message
+        async with self._lock:
+            if self.db is None:
+                db = await aiosqlite.connect(self.path)
+                try:
+                    await db.execute("PRAGMA journal_mode = WAL")
+                    await db.execute("PRAGMA synchronous = NORMAL")
+                    await migrate(db, self.legacy_path)
+                except BaseException:
+                    # A failed migration must not leave the connection's worker thread holding the process open
+                    await db.close()
+                    raise
+                self.db = db
+        return self.db
+
+    async def close(self):
+        if self.db is not None:
+            await self.db.close()
+            self.db = None
+
+    async def optimize(self):
+        # Periodic upkeep: refresh planner stats and fold the WAL back so it does not grow unbounded
+        db = self.db or await self.open()
+        await db.execute("PRAGMA optimize")
+        async with db.execute("PRAGMA wal_checkpoint(PASSIVE)") as cursor:
+            return await cursor.fetchone()
+
+    async def get_user(self, guild_id, user_id):
+        db = self.db or await self.open()
+        async with db.execute("SELECT xp, level FROM users WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)) as cursor:
+            row = await cursor.fetchone()
+        if row is not None or guild_id == LEGACY_GUILD_ID:
+            return row
+        return await self._adopt_legacy(db, guild_id, user_id)
+
+    async def _adopt_legacy(self, db, guild_id, user_id):
+        async with db.execute("SELECT xp, level FROM users WHERE guild_id = ? AND user_id = ?", (LEGACY_GUILD_ID, user_id)) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        await db.execute("UPDATE users SET guild_id = ? WHERE guild_id = ? AND user_id = ?", (guild_id, LEGACY_GUILD_ID, user_id))
+        await db.commit()
+        return row
+
+    async def set_user(self, guild_id, user_id, xp, level):
+        db = self.db or await self.open()
+        await db.execute(
+            "INSERT INTO users (guild_id, user_id, xp, level) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (guild_id, user_id) DO UPDATE SET xp = excluded.xp, level = excluded.level",
+            (guild_id, user_id, xp, level)
+        )
+        await db.commit()
+
+    async def add_xp(self, guild_id, user_id, amount):
+        db = self.db or await self.open()
+        # Claim a legacy row first, in the same transaction, so the increment lands on top of it
+        await db.execute(
+            "UPDATE users SET guild_id = ? WHERE guild_id = ? AND user_id = ? "
+            "AND NOT EXISTS (SELECT 1 FROM users WHERE guild_id = ? AND user_id = ?)",
+            (guild_id, LEGACY_GUILD_ID, user_id, guild_id, user_id)
+        )
+        async with db.execute(
+            "INSERT INTO users (guild_id, user_id, xp, level) VALUES (?, ?, ?, 0) "
+            "ON CONFLICT (guild_id, user_id) DO UPDATE SET xp = xp + excluded.xp RETURNING xp, level",
+            (guild_id, user_id, amount)
+        ) as cursor:
+            row = await cursor.fetchone()
+        await db.commit()
+        return row
+
+    async def set_level(self, guild_id, user_id, expected, level):
+        db = self.db or await self.open()
+        async with db.execute(
+            "UPDATE users SET level = ? WHERE guild_id = ? AND user_id = ? AND level = ? RETURNING xp, level",
+            (level, guild_id, user_id, expected)
+        ) as cursor:
+            row = await cursor.fetchone()
+        await db.commit()
+        return row
+
+    async def bulk_write(self, rows):
+        db = self.db or await self.open()
+        await db.executemany(
+            "INSERT INTO users (guild_id, user_id, xp, level) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (guild_id, user_id) DO UPDATE SET xp = excluded.xp, level = excluded.level",
+            rows
+        )
+        await db.commit()
+
+    async def top(self, guild_id, limit=10, offset=0):
+        # Walks users_guild_rank, so it only touches the rows it returns
+        db = self.db or await self.open()
+        async with db.execute(
+            "SELECT user_id, xp, level FROM users WHERE guild_id = ? ORDER BY xp DESC LIMIT ? OFFSET ?",
+            (guild_id, limit, offset)
+        ) as cursor:
+            return await cursor.fetchall()
+
+    async def rank_of(self, guild_id, user_id):
+        db = self.db or await self.open()
+        async with db.execute(
+            "SELECT COUNT(*) + 1 FROM users WHERE guild_id = ? AND xp > (SELECT xp FROM users WHERE guild_id = ? AND user_id = ?)",
+            (guild_id, guild_id, user_id)
+        ) as cursor:
+            (rank,) = await cursor.fetchone()
+        return rank
+
+    async def guild_levels(self, guild_id):
+        db = self.db or await self.open()
+        async with db.execute("SELECT user_id, level FROM users WHERE guild_id = ?", (guild_id,)) as cursor:
+            return {user_id: level async for user_id, level in cursor}
+
+class MemoryStorage(StorageBackend):
+    # Dict-backed backend for tests and load runs; nothing survives a restart
+    def __init__(self):
+        self.guilds = {}
+
+    async def get_user(self, guild_id, user_id):
+        row = self.guilds.get(guild_id, {}).get(user_id)
+        return tuple(row) if row is not None else None
+
+    async def set_user(self, guild_id, user_id, xp, level):
+        self.guilds.setdefault(guild_id, {})[user_id] = [xp, level]
+
+    async def add_xp(self, guild_id, user_id, amount):
+        # No await between the read and the write, so this is atomic on the event loop
+        row = self.guilds.setdefault(guild_id, {}).setdefault(user_id, [0, 0])
+        row[0] += amount
+        return tuple(row)
+
+    async def set_level(self, guild_id, user_id, expected, level):
+        row = self.guilds.get(guild_id, {}).get(user_id)
+        if row is None or row[1] != expected:
+            return None
+        row[1] = level
+        return tuple(row)
+
+    async def bulk_write(self, rows):
+        for guild_id, user_id, xp, level in rows:
+            self.guilds.setdefault(guild_id, {})[user_id] = [xp, level]
+
+    async def top(self, guild_id, limit=10, offset=0):
+        users = self.guilds.get(guild_id, {})
+        ranked = sorted(users.items(), key=lambda item: item[1][0], reverse=True)
+        return [(user_id, xp, level) for user_id, (xp, level) in ranked[offset:offset + limit]]
+
+    async def rank_of(self, guild_id, user_id):
+        users = self.guilds.get(guild_id, {})
+        row = users.get(user_id)
+        if row is None:
+            return 1
+        return 1 + sum(1 for xp, _ in users.values() if xp > row[0])
+
+    async def guild_levels(self, guild_id):
+        return {user_id: level for user_id, (_, level) in self.guilds.get(guild_id, {}).items()}
@@ -0,0 +1,95 @@
+import asyncio, os, random, shutil, sys, tempfile, time
+import modules.storage as storage
+
+# Same checks and the same workload against every backend: `python -m modules.storage_bench [users] [ops]`
+
+async def conformance(backend):
+    assert await backend.get_user(1, 10) is None
+    await backend.set_user(1, 10, 50, 1)
+    assert tuple(await backend.get_user(1, 10)) == (50, 1)
+    assert await backend.get_user(2, 10) is None, "XP must not leak across guilds"
+
+    assert tuple(await backend.add_xp(1, 10, 25)) == (75, 1)
+    assert tuple(await backend.add_xp(1, 11, 5)) == (5, 0)
+    assert tuple(await backend.set_level(1, 11, 0, 1)) == (5, 1)
+    assert await backend.set_level(1, 11, 0, 1) is None, "A level-up must only apply once"
+
+    await backend.bulk_write([(1, 12, 500, 4), (1, 13, 1, 0), (2, 12, 7, 0), (1, 10, 80, 1)])
+    assert tuple(await backend.get_user(1, 10)) == (80, 1)
+    assert [row[0] for row in await backend.top(1, limit=3)] == [12, 10, 11]
+    assert [row[0] for row in await backend.top(1, limit=2, offset=2)] == [11, 13]
+    assert await backend.rank_of(1, 12) == 1
+    assert await backend.rank_of(1, 13) == 4
+    assert await backend.guild_levels(2) == {12: 0}
+
+    # Concurrent increments on one row must not lose updates
+    await asyncio.gather(*(backend.add_xp(3, 1, 1) for _ in range(50)))
+    assert tuple(await backend.get_user(3, 1)) == (50, 0)
+
+async def workload(backend, users, operations, guilds=10, seed=0):
+    rand = random.Random(seed)
+    timings = {}
+
+    async def timed(name, coro):
+        start = time.perf_counter()
+        result = await coro
+        timings[name] = time.perf_counter() - start
+        return result
+
+    rows = [(g, u, rand.randint(0, 100000), rand.randint(0, 30)) for g in range(guilds) for u in range(users // guilds)]
+    await timed("bulk_write", backend.bulk_write(rows))
+
+    async def reads():
+        for _ in range(operations):
+            await backend.get_user(rand.randrange(guilds), rand.randrange(users // guilds))
+    async def increments():
+        for _ in range(operations):
+            await backend.add_xp(rand.randrange(guilds), rand.randrange(users // guilds), rand.randint(15, 25))
+    async def leaderboards():
+        for _ in range(operations // 100 or 1):
+            await backend.top(rand.randrange(guilds), limit=10)
+
+    await timed("get_user", reads())
+    await timed("add_xp", increments())
+    await timed("top", leaderboards())
+    return {
+        "bulk_write": (len(rows), timings["bulk_write"]),
+        "get_user": (operations, timings["get_user"]),
+        "add_xp": (operations, timings["add_xp"]),
+        "top": (operations // 100 or 1, timings["top"]),
+    }
+
+async def _run_backend(name, make_backend, users, operations):
+    backend = make_backend()
+    await backend.open()
+    try:
+        await conformance(backend)
+    finally:
+        await backend.close()
+
+    backend = make_backend()
+    await backend.open()
+    try:
+        results = await workload(backend, users, operations)
+    finally:
+        await backend.close()
+
+    print(f"{name}: conformance ok")
+    for op, (count, seconds) in results.items():
+        print(f"  {op:<11} {count:>8} ops  {seconds * 1000:9.1f}ms  {count / seconds if seconds else float('inf'):>12,.0f} ops/s")
+
+async def main(users=100000, operations=20000):
+    directory = tempfile.mkdtemp()
+    counter = iter(range(1000))
+
+    def sqlite_backend():
+        return storage.SQLiteStorage(os.path.join(directory, f"bench-{next(counter)}.db"), legacy_path=None)
+
+    try:
+        await _run_backend("memory", storage.MemoryStorage, users, operations)
+        await _run_backend("sqlite", sqlite_backend, users, operations)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:3])))
@@ -0,0 +1,236 @@
+import contextvars, json, logging, queue, random, threading, time, urllib.request
+from collections import deque
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+TRACE_PATH = "./logs/traces.jsonl"
+OTLP_ENDPOINT = "http://localhost:4318/v1/traces"
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+class _NoopSpan:
+    # Returned when no trace is active, so instrumented code costs one contextvar lookup
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP = _NoopSpan()
+
+class _Trace:
+    __slots__ = ("tracer", "trace_id", "spans")
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans = []
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error", "_token")
+
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = self.end_ns = 0
+        self.error = None
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self):
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        _current.reset(self._token)
+        if exc is not None:
+            self.error = repr(exc)
+        self.trace.spans.append(self)
+        if self.parent_id is None:
+            self.trace.tracer._finish(self.trace, self)
+        return False
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+def current():
+    # The innermost open span, for tagging it after the fact (e.g. once the command is known)
+    return _current.get() or _NOOP
+
+def span(name, **attributes):
+    # A child of whatever span is current in this task; a no-op outside a trace
+    parent = _current.get()
+    if parent is None:
+        return _NOOP
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+class Tracer:
+    # Every event is traced, but only slow or failed traces (plus an optional random sample) are kept
+    def __init__(self, exporters=(), slow_ms=250, sample_rate=0.0, ring_size=500, enabled=True):
+        self.exporters = list(exporters)
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.recent = deque(maxlen=ring_size)
+        self.enabled = enabled
+        self.seen = 0
+        self.kept = 0
+
+    def trace(self, name, **attributes):
+        if not self.enabled:
+            return _NOOP
+        return Span(_Trace(self), name, None, attributes)
+
+    def _finish(self, trace, root):
+        self.seen += 1
+        if root.duration_ms < self.slow_ms and not any(s.error for s in trace.spans) and random.random() >= self.sample_rate:
+            return
+        # A copy, so children of tasks that outlive the event cannot land after the root
+        spans = list(trace.spans)
+        self.kept += 1
+        self.recent.append(spans)
+        for exporter in self.exporters:
+            exporter.export(spans)
+
+    def slowest(self, count=5):
+        # Each entry is a trace's span list with the root last
+        return sorted(self.recent, key=lambda spans: spans[-1].duration_ms, reverse=True)[:count]
+
+    def shutdown(self):
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+    def stats(self):
+        return {"seen": self.seen, "kept": self.kept, "buffered": len(self.recent)}
+
+def format_trace(spans, limit=8):
+    root = spans[-1]
+    tags = " ".join(f"{key}={value}" for key, value in root.attributes.items() if value is not None)
+    lines = [f"**{root.name}** {root.duration_ms:.0f}ms {tags}".rstrip()]
+    # Children in the order they started, slow REST calls and stages show up as their own lines
+    for child in sorted(spans[:-1], key=lambda s: s.start_ns)[:limit]:
+        offset = (child.start_ns - root.start_ns) / 1e6
+        lines.append(f"  +{offset:.0f}ms {child.name} {child.duration_ms:.1f}ms" + (f" ⚠ {child.error}" if child.error else ""))
+    if len(spans) - 1 > limit:
+        lines.append(f"  ... {len(spans) - 1 - limit} more spans")
+    return "\n".join(lines)
+
+class _BackgroundExporter:
+    # Spans are handed to a writer thread so exporting never blocks the event loop
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self.thread.start()
+
+    def export(self, spans):
+        self.queue.put(spans)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            spans = self.queue.get()
+            if spans is None:
+                return
+            batch = [spans]
+            # Drain whatever else is waiting so a burst of slow traces goes out in one write
+            while not self.queue.empty():
+                spans = self.queue.get()
+                if spans is None:
+                    stopping = True
+                    break
+                batch.append(spans)
+            try:
+                self._write(batch)
+            except Exception as e:
+                log.warning("%s failed to export %d traces: %s", type(self).__name__, len(batch), e)
+
+    def shutdown(self, timeout=5):
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+class JsonlExporter(_BackgroundExporter):
+    def __init__(self, path=TRACE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        super().__init__()
+
+    def _write(self, batch):
+        with self.path.open("a", encoding="utf-8") as out:
+            for spans in batch:
+                out.writelines(json.dumps(s.to_dict(), default=str) + "\n" for s in spans)
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class OtlpExporter(_BackgroundExporter):
+    # OTLP/HTTP with the JSON encoding, which any local OpenTelemetry collector accepts without extra packages
+    def __init__(self, endpoint=OTLP_ENDPOINT, service_name="astromech", timeout=5):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        super().__init__()
+
+    def _span(self, s):
+        span = {
+            "traceId": s.trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in s.attributes.items() if value is not None],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            span["parentSpanId"] = s.parent_id
+        return span
+
+    def _write(self, batch):
+        body = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": [self._span(s) for spans in batch for s in spans]}],
+        }]}
+        request = urllib.request.Request(self.endpoint, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+        urllib.request.urlopen(request, timeout=self.timeout).close()
+
+def instrument_http(http):
+    # Wraps discord.py's HTTPClient.request so every REST call becomes a span, tagged with its route
+    request = http.request
+
+    async def traced_request(route, **kwargs):
+        tags = {key: value for key, value in (("guild", route.guild_id), ("channel", route.channel_id)) if value is not None}
+        with span(f"{route.method} {route.path}", **tags):
+            return await request(route, **kwargs)
+
+    http.request = traced_request
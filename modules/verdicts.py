@@ -0,0 +1,46 @@
+from collections import OrderedDict
+
+class VerdictCache:
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key(self, text, version):
+        # str caches its own hash, so repeated lookups of the same message object are nearly free;
+        # the length guards against the odd 64-bit collision turning into a wrong verdict.
+        # Guilds each have their own pattern set version, so it is part of the key; old versions age out of the LRU.
+        return version, hash(text), len(text)
+
+    def get(self, text, version):
+        key = self._key(text, version)
+        verdict = self.entries.get(key)
+        if verdict is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return verdict
+
+    def put(self, text, version, verdict):
+        key = self._key(text, version)
+        self.entries[key] = verdict
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,157 @@
+import argparse, asyncio, csv, json, logging, sqlite3, sys, time
+import modules.leveling as leveling, modules.storage as storage
+
+log = logging.getLogger(__name__)
+
+# Rows per executemany/commit on import and per fetchmany on export
+CHUNK_SIZE = 5000
+FIELDS = ("guild_id", "user_id", "xp", "level")
+
+# Column names other leveling bots use in their exports
+_ALIASES = {
+    "guild": "guild_id", "server_id": "guild_id",
+    "id": "user_id", "user": "user_id", "member_id": "user_id",
+    "experience": "xp", "exp": "xp", "points": "xp",
+    "lvl": "level",
+}
+
+def _guess_format(path, fmt):
+    if fmt:
+        return fmt
+    return "csv" if str(path).lower().endswith(".csv") else "jsonl"
+
+def export_xp(db_path, out, fmt="jsonl", guild_id=None, progress=None):
+    # Streams the users table through a cursor; memory use is one chunk whatever the table size
+    db = sqlite3.connect(db_path)
+    try:
+        query = "SELECT guild_id, user_id, xp, level FROM users"
+        params = ()
+        if guild_id is not None:
+            query += " WHERE guild_id = ?"
+            params = (guild_id,)
+        cursor = db.execute(query + " ORDER BY guild_id, user_id", params)
+
+        writer = csv.writer(out) if fmt == "csv" else None
+        if writer:
+            writer.writerow(FIELDS)
+
+        written = 0
+        while True:
+            rows = cursor.fetchmany(CHUNK_SIZE)
+            if not rows:
+                break
+            if writer:
+                writer.writerows(rows)
+            else:
+                out.writelines(json.dumps(dict(zip(FIELDS, row))) + "\n" for row in rows)
+            written += len(rows)
+            if progress:
+                progress(written)
+        return written
+    finally:
+        db.close()
+
+def _read_records(source, fmt):
+    if fmt == "csv":
+        yield from csv.DictReader(source)
+    else:
+        for line_number, line in enumerate(source, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                log.warning("Skipping line %d: %s", line_number, e)
+
+def _normalize(record, default_guild_id):
+    record = {_ALIASES.get(key.strip().lower(), key.strip().lower()): value for key, value in record.items()}
+    guild_id = record.get("guild_id") or default_guild_id
+    if guild_id in (None, "") or record.get("user_id") in (None, ""):
+        raise ValueError("needs guild_id (or a default guild) and user_id")
+    xp = int(float(record.get("xp") or 0))
+    # Levels from other bots follow other curves; ours is always derived from xp
+    return int(guild_id), int(record["user_id"]), xp, leveling.level_for_xp(xp)
+
+def import_xp(db_path, source, fmt="jsonl", default_guild_id=None, progress=None):
+    # Upserts in chunked transactions, replacing xp/level for users that already exist
+    db = sqlite3.connect(db_path)
+    try:
+        db.execute("PRAGMA journal_mode = WAL")
+        imported = skipped = 0
+        chunk = []
+
+        def flush():
+            db.executemany(
+                "INSERT INTO users (guild_id, user_id, xp, level) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, user_id) DO UPDATE SET xp = excluded.xp, level = excluded.level",
+                chunk
+            )
+            db.commit()
+
+        for record in _read_records(source, fmt):
+            try:
+                chunk.append(_normalize(record, default_guild_id))
+            except (ValueError, TypeError, AttributeError) as e:
+                skipped += 1
+                if skipped <= 10:
+                    log.warning("Skipping record %r: %s", record, e)
+                continue
+
+            if len(chunk) >= CHUNK_SIZE:
+                flush()
+                imported += len(chunk)
+                chunk = []
+                if progress:
+                    progress(imported)
+
+        if chunk:
+            flush()
+            imported += len(chunk)
+            if progress:
+                progress(imported)
+        return imported, skipped
+    finally:
+        db.close()
+
+async def _ensure_schema(db_path):
+    backend = storage.SQLiteStorage(db_path)
+    await backend.open()
+    await backend.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modules.xp_transfer", description="Stream XP data in or out of levels.db.")
+    parser.add_argument("action", choices=("export", "import"))
+    parser.add_argument("path", help="file to write to or read from, '-' for stdout/stdin")
+    parser.add_argument("--db", default="./configs/levels.db")
+    parser.add_argument("--format", choices=("jsonl", "csv"))
+    parser.add_argument("--guild", type=int, help="export only this guild / guild id for imported rows without one")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+
+    asyncio.run(_ensure_schema(args.db))
+    fmt = _guess_format(args.path, args.format)
+    start = time.perf_counter()
+
+    def progress(count):
+        print(f"\r{count} rows...", end="", file=sys.stderr, flush=True)
+
+    if args.action == "export":
+        out = sys.stdout if args.path == "-" else open(args.path, "w", encoding="utf-8", newline="")
+        try:
+            count = export_xp(args.db, out, fmt, args.guild, progress)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(f"\nExported {count} rows in {time.perf_counter() - start:.1f}s.", file=sys.stderr)
+    else:
+        source = sys.stdin if args.path == "-" else open(args.path, "r", encoding="utf-8", newline="")
+        try:
+            count, skipped = import_xp(args.db, source, fmt, args.guild, progress)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        print(f"\nImported {count} rows ({skipped} skipped) in {time.perf_counter() - start:.1f}s.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
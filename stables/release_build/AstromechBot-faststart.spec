@@ -0,0 +1,49 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Fast-start variant of AstromechBot.spec: a onedir build without UPX.
+# The onefile exe decompresses and unpacks itself into a temp dir on every launch;
+# this one starts straight from dist/AstromechBot/, so restarts after a crash are quicker.
+# Compare the two with: python -m modules.startup measure dist/AstromechBot.exe dist/AstromechBot/AstromechBot.exe
+
+
+a = Analysis(
+    ['main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[('configs', 'configs'), ('levels.db', '.'), ('.env', '.')],
+    hiddenimports=['modules.xp_transfer', 'modules.moderation'],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=['tkinter', 'unittest', 'pydoc', 'test'],
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='AstromechBot',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='AstromechBot',
+)
@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('configs', 'configs'), ('levels.db', '.'), ('.env', '.')],
-    hiddenimports=[],
+    hiddenimports=['modules.xp_transfer', 'modules.moderation'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,45 @@
+import json, random, re, string
+from pathlib import Path
+
+import modules.patterns as patterns
+
+BLOCKED_FORMATS = json.loads((Path(__file__).resolve().parent.parent / "configs" / "blockedFormats.json").read_text())
+
+SAMPLES = [
+    "hello there, how is everyone doing",
+    "@everyone free nitro at https://discord.gg/abc",
+    "free nİtro",
+    "https://dİscord.gg/abc",
+    "FREE NITRO",
+    "ſteam gift",
+    "claim your reward: claim reward now",
+    "contact me at someone@example.com",
+    "call +4915112345678 today",
+    "server is 192.168.0.1",
+    "card 4111 1111 1111 1111",
+    "I live at 221 Baker Street.",
+    "ＦＲＥＥ nitro",
+    "١٢٣٤٥٦٧٨٩ digits",
+]
+
+def _reference(text):
+    # What the baseline did: plain re.search with IGNORECASE, first pattern in config order wins
+    for name, pattern in BLOCKED_FORMATS["blocked_patterns"].items():
+        if re.search(pattern["regex"], text, re.IGNORECASE):
+            return True, name
+    return False, None
+
+def _mutations(seed=0, count=2000):
+    rand = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + " .:/@-+İıſK"
+    for _ in range(count):
+        text = list(rand.choice(SAMPLES))
+        for _ in range(rand.randint(0, 3)):
+            text[rand.randrange(len(text))] = rand.choice(alphabet)
+        yield "".join(text)
+
+def test_search_matches_plain_re():
+    pattern_set = patterns.compile_patterns(BLOCKED_FORMATS)
+    assert len(pattern_set.patterns) == len(BLOCKED_FORMATS["blocked_patterns"])
+    for text in SAMPLES + list(_mutations()):
+        assert pattern_set.search(text) == _reference(text), text